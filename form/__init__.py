@@ -1,16 +1,18 @@
-import copy
+import asyncio
 import dataclasses
 import datetime
-import time
-from dataclasses import is_dataclass
+import inspect
+import itertools
+import threading
+from contextlib import contextmanager
 from functools import partial
 from typing import Any
 from typing import List
+from typing import Mapping
 from typing import Union
 
 from pglet import Button
 from pglet import Checkbox
-from pglet import ChoiceGroup
 from pglet import ComboBox
 from pglet import Control
 from pglet import DatePicker
@@ -27,7 +29,37 @@ from pglet import combobox
 from pglet import dropdown
 from pglet.control_event import ControlEvent
 
-__all__ = ["Form"]
+from form.schema import BASIC
+from form.schema import CHOICE
+from form.schema import COMPLEX
+from form.schema import ControlMapping
+from form.schema import FieldSpec
+from form.schema import FormSchema
+from form.schema import LIST
+from form.schema import MULTIPLE_CHOICE
+from form.schema import PROVIDED_CHOICE
+from form.schema import TRUNCATED
+from form.schema import is_complex_type
+from form.schema import resolve_control_type
+from form.schema import schema_cache
+from form.instrumentation import FormMetrics
+from form.instrumentation import no_timer
+from form.options import enum_option_source
+from form.options import enum_options
+from form.options import provider_option_source
+from form.registry import FieldRegistry
+from form.registry import FieldState
+from form.scheduler import ScheduledCall
+from form.scheduler import default_scheduler
+from form.working_copy import WorkingCopy
+from form.working_copy import shallow_copy
+
+try:
+    from pydantic import validate_model
+except ImportError:
+    validate_model = None
+
+__all__ = ["Form", "FormSchema", "SearchableChoice"]
 
 
 class Form(Stack):
@@ -65,8 +97,25 @@ class Form(Stack):
         # 'SecretStr': , not supported by pglet yet
     }
 
-    default_data_to_control_mapping = _standard_library_types
-    default_data_to_control_mapping.update(_pydantic_types)
+    # Keys are type names or types, subclasses use the control of the closest base class in the mapping
+    default_data_to_control_mapping = ControlMapping({**_standard_library_types, **_pydantic_types})
+
+    # Compiled schemas shared by all forms in the process
+    schema_cache = schema_cache
+
+    # Deferred work, like resetting the submit button after failed validation
+    scheduler = default_scheduler
+    submit_feedback_seconds = 5
+
+    # Sink for the metrics of all forms, like form.instrumentation.collector. Setting it enables metrics
+    metrics_sink = None
+
+    # Seconds without changes before a field is validated, with live validation
+    live_validation_delays = {
+        Textbox: 0.5,
+        SpinButton: 0.2,
+    }
+    default_live_validation_delay = 0.3
 
     # Alignments when not "top"
     _label_alignment_by_control_type = {
@@ -96,6 +145,15 @@ class Form(Stack):
         gap: int = 10,
         width="min(600px, 90%)",
         threshold_for_dropdown=3,
+        threshold_for_search: int = 100,
+        bulk_validation: bool = False,
+        list_page_size: int = 50,
+        collapse_sections: bool = False,
+        list_style: str = "rows",
+        max_depth: int = 10,
+        live_validation: bool = False,
+        live_validation_delays: dict = None,
+        metrics: bool = False,
         **kwargs,
     ):
         super().__init__(**kwargs)
@@ -110,19 +168,22 @@ class Form(Stack):
         self.control_style = control_style
         self.control_kwargs = control_kwargs or {}
         self.threshold_for_dropdown = threshold_for_dropdown
+        self.threshold_for_search = threshold_for_search
+        self.bulk_validation = bulk_validation
+        self.list_page_size = list_page_size
+        self.collapse_sections = collapse_sections
+        self.list_style = list_style
+        self.max_depth = max_depth
+        self.live_validation = live_validation
+        self.live_validation_delays = {**self.live_validation_delays, **(live_validation_delays or {})}
 
         self.padding = padding
         self.gap = gap
         self.width = width
 
-        self.data_to_control_mapping = self.default_data_to_control_mapping.copy()
-        self.data_to_control_mapping.update(control_mapping or {})
-
-        if toggle_for_bool:
-            self.data_to_control_mapping["bool"] = Toggle
-            self.data_to_control_mapping["StrictBoolValue"] = Toggle
+        self.data_to_control_mapping = self.control_mapping_for(control_mapping, toggle_for_bool)
 
-        if type(value) is type:
+        if isinstance(value, type):
             self._model = value
             try:
                 self.value = self._model()
@@ -132,11 +193,26 @@ class Form(Stack):
             self._model = type(value)
             self.value = value
 
-        self.working_copy = self.autosave and self.value or copy.deepcopy(self.value)
+        # Timings and counters, or None when neither requested nor collected
+        self.metrics = (
+            FormMetrics(self._model.__name__, self.metrics_sink) if metrics or self.metrics_sink else None
+        )
+
+        with self._timer("working_copy"):
+            self.working_copy = WorkingCopy(self.value, write_through=self.autosave)
+
+        with self._timer("schema"):
+            self.schema = self.schema_cache.get(
+                self._model,
+                self.data_to_control_mapping,
+                self.control_kwargs,
+                field_validation_default_error_message=self.field_validation_default_error_message,
+                threshold_for_dropdown=self.threshold_for_dropdown,
+                max_depth=self.max_depth,
+            )
 
-        self._fields = {}
-        self._messages = {}
-        self._pydantic_fields = {}
+        # Controls, messages and validation state of the fields
+        self._registry = FieldRegistry(self.schema)
 
         self.on_submit = getattr(submit_button, "on_click", on_submit)
 
@@ -145,67 +221,70 @@ class Form(Stack):
 
         self._form_not_valid_message = Message(value=self.form_validation_error_message, type="error", visible=False)
 
-        self._create_controls()
+        # Live validation and submit feedback run on scheduler threads, submits on pglet handler threads. The lock
+        # keeps their updates out of each other's batches.
+        self._lock = threading.RLock()
+        self._update_batch = None
+        self.last_update_batch = None
+        self._submit_feedback = None
+        self._live_validations = {}
+        self._running_live_validations = set()
+
+        with self._timer("controls"):
+            self._create_controls()
+
+    @classmethod
+    def control_mapping_for(cls, control_mapping: dict = None, toggle_for_bool: bool = False) -> ControlMapping:
+        """Mapping from types to controls for a form with these options."""
+        data_to_control_mapping = cls.default_data_to_control_mapping.copy()
+        data_to_control_mapping.update(control_mapping or {})
+
+        if toggle_for_bool:
+            data_to_control_mapping["bool"] = Toggle
+            data_to_control_mapping["StrictBoolValue"] = Toggle
+
+        return data_to_control_mapping
+
+    @property
+    def _fields(self) -> Mapping:
+        """Controls of the fields, by path."""
+        return self._registry.controls
+
+    @property
+    def _messages(self) -> Mapping:
+        """Error messages of the fields, by path."""
+        return self._registry.messages
 
     def _create_controls(self):
         title_controls = [Text(value=self.title, bold=True, size="xLarge")] if self.title else []
-        input_controls = self._create_controls_for_annotations(self.working_copy, self._model, self.label_above)
+        input_controls = self._create_controls_for_fields(self.schema.fields, self.label_above)
         button_controls = [
             Stack(horizontal=True, horizontal_align="end", controls=[self._form_not_valid_message, self.submit_button])
         ]
         self.controls = title_controls + input_controls + button_controls
 
-    def _create_controls_for_annotations(self, obj, cls, label_above, path: tuple = tuple()) -> List[Control]:
-        return [
-            self._create_control(attribute, attribute_type, getattr(obj, attribute), label_above, path)
-            for attribute, attribute_type in cls.__annotations__.items()
-        ]
-
-    def _create_control(
-        self,
-        attribute: str,
-        attribute_type: Any,
-        value: Any,
-        label_above: bool,
-        path: tuple
-    ) -> Control:
-
-        # For unions, we consider only the first type annotation
-        origin = getattr(attribute_type, "__origin__", None)
-        if origin and origin == Union:
-            attribute_type = attribute_type.__args__[0]
-
-        control_data = ControlData(
-            attribute=attribute,
-            attribute_type=attribute_type,
-            value=value,
-            label_text=attribute.replace("_", " ").capitalize(),
-            placeholder="",
-            error_message=self.field_validation_default_error_message,
-            kwargs=self.control_kwargs.get(attribute, {}),
-        )
-
-        control_data = self._apply_dataclass_overrides(control_data, path)
-        control_data = self._apply_pydantic_overrides(control_data, path)
-
-        # handle_change_func = partial(self._handle_field_submit_event, path + (attribute,))
+    def _create_controls_for_fields(self, fields: List[FieldSpec], label_above) -> List[Control]:
+        return [self._create_control(field, self.working_copy.get(field.path), label_above) for field in fields]
 
+    def _create_control(self, field: FieldSpec, value: Any, label_above: bool) -> Control:
+        self._count("controls_created")
         is_list = False
 
-        if origin == list and len(attribute_type.__args__) == 1:
-            actual_type = attribute_type.__args__[0]
-            control_data.attribute_type = actual_type
-            if type(actual_type).__name__ == "EnumMeta":
-                control = self._create_choice_control(control_data, multiple=True)
-            else:
-                control = self._create_list_control(control_data)
-                is_list = True
-        elif type(attribute_type).__name__ == "EnumMeta":
-            control = self._create_choice_control(control_data)
-        elif self._is_complex_object(attribute_type):
-            control = self._create_complex_control(control_data, path)
+        if field.kind == MULTIPLE_CHOICE:
+            control = self._create_choice_control(field, value, multiple=True)
+        elif field.kind == LIST:
+            control = self._create_list_control(field, value)
+            is_list = True
+        elif field.kind == CHOICE:
+            control = self._create_choice_control(field, value)
+        elif field.kind == PROVIDED_CHOICE:
+            control = SearchableChoice(provider_option_source(field.option_provider), value=value, **field.kwargs)
+        elif field.kind == COMPLEX and value is not None:
+            control = self._create_complex_control(field, value)
+        elif field.kind in (COMPLEX, TRUNCATED):
+            control = Text(value=str(value))
         else:
-            control = self._create_basic_control(control_data)
+            control = self._create_basic_control(field, value)
 
         if self.control_style == "line":
             try:
@@ -214,15 +293,17 @@ class Form(Stack):
             except AttributeError:
                 pass
 
-        self._fields[path + (attribute,)] = control
-
         controls = [control]
+        message = None
 
-        if not self._is_complex_object(attribute_type):
-            message = Message(value=control_data.error_message, type="error", visible=False)
-            self._messages[path + (attribute,)] = message
+        if isinstance(control, SectionControl):
+            message = control.message
+        elif field.kind not in (COMPLEX, TRUNCATED):
+            message = Message(value=field.error_message, type="error", visible=False)
             controls.append(message)
 
+        self._track_changes(self._registry.add(field, control, message))
+
         control_stack = Stack(
             controls=controls,
             width=self.control_width,
@@ -233,7 +314,7 @@ class Form(Stack):
             control.label = None
 
         label_text = Text(
-            value=control_data.label_text,
+            value=field.label_text,
             width="100%",
             bold=True,
             align=self.label_alignment,
@@ -263,269 +344,1363 @@ class Form(Stack):
         return attribute_stack
 
     def _is_complex_object(self, object_type: type):
-        return is_dataclass(object_type) or hasattr(object_type, "__fields__")
-
-    def _apply_dataclass_overrides(self, control_data, path):
-        custom_kwargs = {}
-        if hasattr(self._model, "__dataclass_fields__"):
-            dataclass_field = self.value.__dataclass_fields__.get(control_data.attribute)
-            if dataclass_field:
-                metadata = dataclass_field.metadata
-                if metadata:
-                    custom_kwargs = metadata.get('pglet', {})
-
-        if custom_kwargs:
-            control_data.kwargs.update(custom_kwargs)
-
-        return control_data
-
-    def _apply_pydantic_overrides(self, control_data, path):
-        pydantic_field = (
-            hasattr(self._model, "__fields__") and self.value.__fields__.get(control_data.attribute) or None
-        )
-
-        if pydantic_field:
-            self._pydantic_fields[path + (control_data.attribute,)] = pydantic_field
-
-            label_text = pydantic_field.field_info.title
-            if label_text:
-                control_data.label_text = label_text
-
-            placeholder = pydantic_field.field_info.description
-            if placeholder:
-                control_data.placeholder = placeholder
-                control_data.error_message = placeholder
-
-            extra = pydantic_field.field_info.extra
-            if extra:
-                control_data.kwargs.update(extra.get('pglet', {}))
-
-        return control_data
+        return is_complex_type(object_type)
 
-    def _create_basic_control(self, control_data):
-        control_type = self.data_to_control_mapping.get(control_data.attribute_type.__name__, Textbox)
-        control = control_type(value=control_data.value, **control_data.kwargs)
+    def _create_basic_control(self, field: FieldSpec, value: Any) -> Control:
+        control_type = field.control_type
+        control = control_type(value=value, **field.kwargs)
         if control_type in (DatePicker, Dropdown, Textbox):
-            control.placeholder = control_data.placeholder
+            control.placeholder = field.placeholder
         return control
 
-    def _create_choice_control(self, control_data, multiple=False):
-        enum_type = control_data.attribute_type
+    def _create_choice_control(self, field: FieldSpec, value: Any, multiple=False) -> Control:
+        enum_type = field.attribute_type
+
+        if len(enum_type) >= self.threshold_for_search:
+            return SearchableChoice(
+                enum_option_source(enum_type), value=self._to_control_value(field, value), multiple=multiple
+            )
 
         if multiple:
             return ComboBox(
                 multi_select=True,
-                options=[combobox.Option(key=option.value, text=option.value.title()) for option in enum_type],
-                value=[enum_type(value).value for value in control_data.value],
+                options=[combobox.Option(key=key, text=text) for key, text in enum_options(enum_type)],
+                value=self._to_control_value(field, value),
             )
 
-        if len(enum_type) >= self.threshold_for_dropdown:
-            control_type = Dropdown
-            option_type = dropdown.Option
-        else:
-            control_type = ChoiceGroup
-            option_type = choicegroup.Option
-
-        value = enum_type(control_data.value).value
+        option_type = dropdown.Option if field.control_type is Dropdown else choicegroup.Option
 
-        return control_type(
-            options=[option_type(key=option.value, text=option.value.title()) for option in enum_type],
-            value=value,
+        return field.control_type(
+            options=[option_type(key=key, text=text) for key, text in enum_options(enum_type)],
+            value=self._to_control_value(field, value),
         )
 
-    def _create_complex_control(self, control_data, path):
+    @staticmethod
+    def _to_control_value(field: FieldSpec, value: Any) -> Any:
+        if field.kind == CHOICE:
+            return field.attribute_type(value).value
+        if field.kind == MULTIPLE_CHOICE:
+            return [field.attribute_type(item).value for item in value]
+        return value
+
+    def _create_complex_control(self, field: FieldSpec, value: Any) -> Control:
+        if self.collapse_sections:
+            return SectionControl(form=self, field=field, width="100%")
         return Stack(
             width="100%",
-            controls=self._create_controls_for_annotations(
-                control_data.value, control_data.attribute_type, label_above=True, path=path + (control_data.attribute,)
-            ),
+            controls=self._create_controls_for_fields(field.children, label_above=True),
         )
 
-    def _create_list_control(self, control_data: "ControlData") -> "ListControl":
-        if self._is_complex_object(control_data.attribute_type):
+    def _create_list_control(self, field: FieldSpec, value: Any) -> "ListControl":
+        if self._is_complex_object(field.attribute_type) and (field.list_style or self.list_style) == "grid":
+            return GridListControl(
+                value=value,
+                attribute_type=field.attribute_type,
+                form=self,
+                field=field,
+                page_size=self.list_page_size,
+            )
+        elif self._is_complex_object(field.attribute_type):
             return ListControl(
-                value=control_data.value,
-                attribute_type=control_data.attribute_type,
+                value=value,
+                attribute_type=field.attribute_type,
                 form=self,
                 simple=False,
                 panel_width=self.width,
+                field=field,
+                page_size=self.list_page_size,
             )
         else:
             return ListControl(
-                value=control_data.value,
-                attribute_type=control_data.attribute_type,
+                value=value,
+                attribute_type=field.attribute_type,
                 form=self,
+                field=field,
+                page_size=self.list_page_size,
             )
 
-    def _handle_field_submit_event(self, attribute, event):
-        self._validate_value(attribute)
+    def _track_changes(self, state: FieldState):
+        if state.field.kind in (COMPLEX, LIST, TRUNCATED):
+            # Nested fields track their own changes, lists report theirs to the form
+            return
+        control = state.control
+        if not isinstance(getattr(type(control), "on_change", None), property):
+            state.tracked = False
+            return
+        control.on_change = partial(self._handle_field_change_event, state.path, control.on_change)
+
+    def _handle_field_change_event(self, attribute: tuple, original_handler: callable, event):
+        # pglet calls every handler in its own thread, keep overlapping changes from orphaning scheduled validations
+        with self._lock:
+            self._mark_dirty(attribute)
+            if self.live_validation:
+                self._schedule_live_validation(attribute)
+        if original_handler:
+            original_handler(event)
+
+    def _schedule_live_validation(self, attribute: tuple):
+        """
+        Validate the field once it has not changed for the debounce delay of its control type. Every change restarts
+        the delay, so a burst of keystrokes results in a single validation.
+        """
+        pending = self._live_validations.get(attribute)
+        if pending:
+            pending.cancel()
+        delay = self._live_validation_delay(self._registry[attribute].control)
+        self._live_validations[attribute] = self.scheduler.call_later(
+            delay, self._live_validate, attribute, pass_call=True
+        )
+
+    def _live_validation_delay(self, control: Control) -> float:
+        for control_type in type(control).__mro__:
+            if control_type in self.live_validation_delays:
+                return self.live_validation_delays[control_type]
+        return self.default_live_validation_delay
+
+    def _live_validate(self, attribute: tuple, call: ScheduledCall = None):
+        with self._lock:
+            if call and self._live_validations.get(attribute) is not call:
+                # Cancelled just after it started, by a newer change or a submit
+                return
+            self._live_validations.pop(attribute, None)
+            self._running_live_validations.add(attribute)
+        dependents = self.schema.fields_by_path[attribute].dependents
+        try:
+            with self.batch_updates():
+                for path in [attribute] + [path for path in dependents if path in self._registry]:
+                    with self._timer("validate_field"):
+                        self._validate_value(path)
+                    self._count("validations")
+        finally:
+            self._running_live_validations.discard(attribute)
+
+    def _cancel_live_validations(self) -> set:
+        """
+        Cancel the pending live validations. Returns the paths of the cancelled validations and of the validations
+        that were already running.
+        """
+        with self._lock:
+            paths = set(self._live_validations) | self._running_live_validations
+            for pending in self._live_validations.values():
+                pending.cancel()
+            self._live_validations.clear()
+        return paths
+
+    def _mark_dirty(self, attribute: tuple):
+        # Waits for a running validation, so that it cannot clear the flag of a change it did not see
+        with self._lock:
+            state = self._registry.get(attribute)
+            if state:
+                state.dirty = True
+
+    @property
+    def dirty_paths(self) -> frozenset:
+        """Paths of the fields that have been changed since they were last validated."""
+        return frozenset(state.path for state in self._registry if state.dirty)
+
+    def _paths_to_validate(self) -> List[tuple]:
+        """
+        Fields that have changed, fields whose validators depend on the changed fields, fields that have no valid
+        cached validation result, and fields whose changes we cannot track. In form order.
+        """
+        dependents = set()
+        for state in self._registry:
+            if state.dirty:
+                dependents.update(state.field.dependents)
+        return [
+            state.path for state in self._registry
+            if state.dirty or not state.tracked or not state.valid or state.path in dependents
+        ]
 
     def _validate_value(self, attribute: str) -> bool:
         is_valid = True
-        control = self._fields[attribute]
-        message = self._messages[attribute]
-        message.value = self.field_validation_default_error_message
-
-        if type(control) is Stack:
+        state = self._registry[attribute]
+        control = state.control
+        field = state.field
+
+        if isinstance(control, SectionControl) and not control.built:
+            return self._validate_section_values(control)
+        elif field.kind in (COMPLEX, TRUNCATED):
+            state.valid = True
             return True
-        elif type(control) is DatePicker and type(control.value) is datetime.datetime:
-            datetime_tuple = control.value.timetuple()
-            if datetime_tuple[3:6] == (0, 0, 0):
-                control.value = datetime.date(datetime_tuple[:3])
 
-        pydantic_field = self._pydantic_fields.get(attribute)
-        if pydantic_field:
+        self._normalize_control_value(control)
+        validated_value = control.value
+
+        message = state.message
+        message.value = self.field_validation_default_error_message
+
+        pydantic_field = field.pydantic_field
+        if isinstance(control, GridListControl) and control.row_errors:
+            is_valid = False
+            message.value = control.error_summary
+        elif pydantic_field:
             description = pydantic_field.field_info.description
             if description:
                 message.value = description
             value, error = pydantic_field.validate(
-                control.value,
-                self.working_copy.dict(),
+                validated_value,
+                self.working_copy.values(attribute[:-1]),
                 loc=attribute,
-                cls=self._model,
+                cls=field.model,
             )
+            if control.value != validated_value:
+                # Changed while being validated, leave the field dirty for the next validation to pick up the change
+                state.dirty = True
+                state.valid = None
+                return False
             if error:
                 is_valid = False
                 message.value = str(error.exc).capitalize()
             else:
                 # Validation can change the value, update control
-                if type(value) is datetime.date:
-                    value = value.isoformat()
-                control.value = value
+                self._set_control_value(control, value)
 
         if is_valid:
-            obj = self.working_copy
-            for attribute_name in attribute[:-1]:
-                obj = getattr(obj, attribute_name)
             try:
-                setattr(obj, attribute[-1], control.value)
+                self._set_working_value(attribute, control.value)
             except ValueError:
                 is_valid = False
 
-        self._messages[attribute].visible = not is_valid
-        self.page.update()
+        message.visible = not is_valid
+        state.dirty = False
+        state.valid = is_valid
+        self._update_page(message, control)
         return is_valid
 
+    def _validate_model(self) -> bool:
+        """
+        Validate all field values with a single pass over the whole pydantic model, including root validators, and
+        map the errors back to the fields by their locations.
+        """
+        values = self.working_copy.as_dict()
+
+        # Pydantic does not revalidate model instances, so nested models are passed as dicts
+        for path in sorted(self.schema.fields_by_path, key=len):
+            if self.schema.fields_by_path[path].kind != COMPLEX:
+                continue
+            target = values
+            for attribute_name in path[:-1]:
+                target = target.get(attribute_name) if type(target) is dict else None
+            if type(target) is dict and target.get(path[-1]) is not None and type(target[path[-1]]) is not dict:
+                target[path[-1]] = dict(target[path[-1]].__dict__)
+
+        for state in self._registry:
+            if state.field.kind in (COMPLEX, TRUNCATED):
+                continue
+            self._normalize_control_value(state.control)
+            target = values
+            for attribute_name in state.path[:-1]:
+                nested = target[attribute_name]
+                if type(nested) is not dict:
+                    nested = target[attribute_name] = dict(nested.__dict__)
+                target = nested
+            target[state.path[-1]] = state.control.value
+
+        self._count("validations", len(self._registry))
+        with self._timer("validate_model"):
+            validated, _, validation_error = validate_model(self._model, values)
+
+        field_errors = {}
+        form_errors = []
+        for error in validation_error and validation_error.errors() or []:
+            path = self._path_for_error_location(error["loc"])
+            if path and self.schema.fields_by_path[path].kind == COMPLEX:
+                # Error in a section that has not been expanded
+                field = self._field_for_error_location(error["loc"])
+                field_errors.setdefault(path, f"{field.label_text}: {error['msg']}")
+            elif path:
+                field_errors.setdefault(path, error["msg"])
+            else:
+                form_errors.append(error["msg"])
+
+        for state in self._registry:
+            path, message = state.path, state.message
+            if message is None:
+                continue
+            error = field_errors.get(path)
+            message.visible = bool(error)
+            if error:
+                message.value = error.capitalize()
+                continue
+            message.value = state.field.error_message
+            if state.field.kind == COMPLEX:
+                continue
+            try:
+                value = validated
+                for attribute_name in path:
+                    value = value[attribute_name] if type(value) is dict else getattr(value, attribute_name)
+            except (AttributeError, KeyError):
+                continue
+            self._set_field_value(path, value)
+
+        self._form_not_valid_message.value = (
+            ". ".join(error.capitalize() for error in form_errors) or self.form_validation_error_message
+        )
+        self._form_not_valid_message.visible = bool(form_errors)
+
+        for state in self._registry:
+            state.dirty = False
+            # Keep the next submit from skipping validation while the form-level error stands
+            state.valid = None if form_errors else state.path not in field_errors
+
+        self._update_page(self)
+        return not (field_errors or form_errors)
+
+    def _set_field_value(self, path: tuple, value: Any):
+        self._set_working_value(path, value)
+        # Validation can change the value, update control
+        self._set_control_value(self._registry[path].control, value)
+
+    def _set_working_value(self, path: tuple, value: Any):
+        # Validated values that did not change are left out, so that submit commits only the changed paths
+        if self.working_copy.get(path) != value:
+            self.working_copy.set(path, value)
+
+    @staticmethod
+    def _set_control_value(control: Control, value: Any):
+        if isinstance(control, ListControl):
+            # Keep the rows, patching only the rows of the items that validation replaced
+            control._replace_items(value)
+        else:
+            control.value = value.isoformat() if type(value) is datetime.date else value
+
+    def _paths_with_validators(self, paths: List[tuple]) -> List[tuple]:
+        """Paths among `paths` that passed validation and have custom validators."""
+        states = [self._registry[path] for path in paths]
+        return [state.path for state in states if state.field.validators and state.message is not None and state.valid]
+
+    def _call_field_validators(self, path: tuple) -> tuple:
+        """
+        Call the custom validators of a field in order, each with the value returned by the previous one and the
+        values of the other fields on the same level. Returns the final value and the error, if any.
+        """
+        value = self.working_copy.get(path)
+        values = self.working_copy.values(path[:-1])
+        try:
+            for validator in self.schema.fields_by_path[path].validators:
+                value = validator(value, values)
+        except (ValueError, TypeError, AssertionError) as error:
+            return value, error
+        return value, None
+
+    async def _call_field_validators_async(self, path: tuple) -> tuple:
+        value = self.working_copy.get(path)
+        values = self.working_copy.values(path[:-1])
+        try:
+            for validator in self.schema.fields_by_path[path].validators:
+                value = validator(value, values)
+                if inspect.isawaitable(value):
+                    value = await value
+        except (ValueError, TypeError, AssertionError) as error:
+            return value, error
+        return value, None
+
+    def _apply_validator_results(self, paths: List[tuple], results: List[tuple]) -> bool:
+        is_valid = True
+        changed = []
+        for path, (value, error) in zip(paths, results):
+            state = self._registry[path]
+            changed += [state.message, state.control]
+            if error:
+                is_valid = False
+                state.message.value = str(error).capitalize() or state.field.error_message
+            else:
+                self._set_field_value(path, value)
+            state.message.visible = bool(error)
+            state.valid = not error
+        if paths:
+            self._update_page(*changed)
+        return is_valid
+
+    def _path_for_error_location(self, location: tuple) -> Union[tuple, None]:
+        for end in range(len(location), 0, -1):
+            state = self._registry.get(location[:end])
+            if state and state.message is not None:
+                return state.path
+        return None
+
+    def _field_for_error_location(self, location: tuple) -> FieldSpec:
+        for end in range(len(location), 0, -1):
+            if location[:end] in self.schema.fields_by_path:
+                return self.schema.fields_by_path[location[:end]]
+
+    def _validate_section_values(self, section: "SectionControl") -> bool:
+        """
+        Validate the values in a section that has not been expanded, without building controls for them.
+        """
+        error = None
+        for field in self.schema.descendants(section.field.path):
+            if not field.pydantic_field or field.kind in (COMPLEX, TRUNCATED):
+                continue
+            try:
+                value = self.working_copy.get(field.path)
+            except AttributeError:
+                # Some nested value along the path is not set
+                continue
+            _, field_error = field.pydantic_field.validate(
+                value,
+                self.working_copy.values(field.path[:-1]),
+                loc=field.path,
+                cls=field.model,
+            )
+            if field_error:
+                error = f"{field.label_text}: {str(field_error.exc)}"
+                break
+
+        section.message.value = error or section.field.error_message
+        section.message.visible = bool(error)
+        state = self._registry[section.field.path]
+        state.dirty = False
+        state.valid = not error
+        self._update_page(section.message)
+        return not error
+
+    @staticmethod
+    def _normalize_control_value(control: Control):
+        if type(control) is DatePicker and type(control.value) is datetime.datetime:
+            datetime_tuple = control.value.timetuple()
+            if datetime_tuple[3:6] == (0, 0, 0):
+                control.value = datetime.date(*datetime_tuple[:3])
+
+    def can_rebind(self, value: Any) -> bool:
+        """
+        True if `rebind` can show `value`: it is an instance of the same model, and the same nested values are set, so
+        that the existing controls fit it.
+        """
+        if type(value) is not self._model:
+            return False
+        return all(
+            (_value_at(value, state.path) is None) == isinstance(state.control, Text)
+            for state in self._registry
+            if state.field.kind == COMPLEX
+        )
+
+    def rebind(self, value: Any):
+        """
+        Show another instance of the same model in the form, updating the values of the existing controls instead of
+        building new ones. The caller is responsible for updating the page.
+        """
+        if type(value) is not self._model:
+            raise ValueError(f"Form for {self._model.__name__} cannot show a {type(value).__name__}")
+        if not self.can_rebind(value):
+            raise ValueError(f"Form for {self._model.__name__} has controls for other nested values")
+
+        self.value = value
+        with self._timer("working_copy"):
+            self.working_copy = WorkingCopy(self.value, write_through=self.autosave)
+
+        for state in self._registry:
+            if state.field.kind not in (COMPLEX, TRUNCATED):
+                state.control.value = self._to_control_value(state.field, self.working_copy.get(state.path))
+            elif isinstance(state.control, Text):
+                # Nested value that is not set, or beyond the depth limit
+                state.control.value = str(self.working_copy.get(state.path))
+            if state.message is not None:
+                state.message.value = state.field.error_message
+                state.message.visible = False
+            state.dirty = False
+            state.valid = None
+        self._form_not_valid_message.visible = False
+        self._cancel_live_validations()
+        if self._submit_feedback:
+            self._submit_feedback.cancel()
+            self._submit_feedback = None
+            self.submit_button.primary = True
+            self.submit_button.icon = "CheckMark"
+
+    @property
+    def is_async(self) -> bool:
+        """True if `on_submit` or any of the field validators is a coroutine function."""
+        return asyncio.iscoroutinefunction(self.on_submit) or self.schema.has_async_validators
+
     def _submit(self, e):
-        if not all(self._validate_value(attribute) for attribute in self._fields):
-            self.submit_button.primary = False
-            self.submit_button.icon = "Cancel"
-            self.page.update()
-            time.sleep(5)
+        # Submit validates everything that changed anyway
+        self._revalidate_live_validations()
+
+        if self.is_async:
+            # pglet calls event handlers in their own threads, so the handler can run its own event loop
+            asyncio.run(self.submit_async())
+            return
+
+        with self._timer("submit"), self.batch_updates():
+            is_valid, validated_paths = self._validate_fields()
+            paths = self._paths_with_validators(validated_paths)
+            results = [self._call_field_validators(path) for path in paths]
+            is_valid = self._apply_validator_results(paths, results) and is_valid
+            self._show_submit_result(is_valid)
+
+        if is_valid:
+            with self._timer("commit"):
+                self.working_copy.commit()
+            if self.on_submit:
+                with self._timer("submit_handler"):
+                    self.on_submit(self._submit_event())
+
+    async def submit_async(self) -> bool:
+        """
+        Validate and submit the form like pressing the submit button does, awaiting async validators and an async
+        `on_submit`. The custom validators of all fields run concurrently, and the results are shown with a single
+        page update. Returns True if the form was valid.
+        """
+        self._revalidate_live_validations()
+        with self._timer("submit"), self.batch_updates():
+            is_valid, validated_paths = self._validate_fields()
+            paths = self._paths_with_validators(validated_paths)
+            results = await asyncio.gather(*(self._call_field_validators_async(path) for path in paths))
+            is_valid = self._apply_validator_results(paths, results) and is_valid
+            self._show_submit_result(is_valid)
+
+        if is_valid:
+            with self._timer("commit"):
+                self.working_copy.commit()
+            if self.on_submit:
+                with self._timer("submit_handler"):
+                    result = self.on_submit(self._submit_event())
+                    if inspect.isawaitable(result):
+                        await result
+        return is_valid
+
+    def _revalidate_live_validations(self):
+        """Cancel the live validations, and have submit validate the fields they were for."""
+        for path in self._cancel_live_validations():
+            self._mark_dirty(path)
+
+    def _validate_fields(self) -> tuple:
+        """Run the model validation. Returns whether the form is valid and the paths that were validated."""
+        paths_to_validate = self._paths_to_validate()
+        if not paths_to_validate:
+            is_valid = True
+        elif self.bulk_validation and validate_model and hasattr(self._model, "__fields__"):
+            is_valid = self._validate_model()
+        else:
+            for attribute in paths_to_validate:
+                with self._timer("validate_field"):
+                    self._validate_value(attribute)
+            self._count("validations", len(paths_to_validate))
+            is_valid = all(state.valid is not False for state in self._registry)
+        return is_valid, paths_to_validate
+
+    def _show_submit_result(self, is_valid: bool):
+        if is_valid:
+            self._reset_submit_button()
+        else:
+            self._show_submit_failure()
+
+    def _submit_event(self) -> ControlEvent:
+        return ControlEvent(self.submit_button, "submit", None, self, self.page)
+
+    def _show_submit_failure(self):
+        if self._submit_feedback:
+            self._submit_feedback.cancel()
+        self.submit_button.primary = False
+        self.submit_button.icon = "Cancel"
+        self._update_page(self.submit_button)
+        self._submit_feedback = self.scheduler.call_later(
+            self.submit_feedback_seconds, self._reset_submit_button, pass_call=True
+        )
+
+    def _reset_submit_button(self, call: ScheduledCall = None):
+        with self._lock:
+            if not self._submit_feedback or call and call is not self._submit_feedback:
+                # Nothing to reset, or the feedback of a newer failure
+                return
+            self._submit_feedback.cancel()
+            self._submit_feedback = None
             self.submit_button.primary = True
             self.submit_button.icon = "CheckMark"
-            self.page.update()
+            self._update_page(self.submit_button)
+
+    @contextmanager
+    def batch_updates(self):
+        """
+        Context manager that collects the page updates requested by the form within the block, and sends them to
+        pglet as a single update of the changed controls at the end.
+
+        Yields an `UpdateBatch` that tells how many updates were requested and coalesced. Nested blocks join the
+        outermost batch. Blocks in other threads wait for the batch to be sent, and start their own.
+        """
+        with self._lock:
+            if self._update_batch:
+                yield self._update_batch
+                return
+
+            batch = self._update_batch = UpdateBatch()
+            try:
+                yield batch
+            finally:
+                self._update_batch = None
+                self.last_update_batch = batch
+                if batch.requested:
+                    self._send_update(None if batch.full else list(batch.controls.values()))
+
+    def _update_page(self, *controls: Control):
+        """
+        Update the changed `controls` on the page, or the whole page if no controls are given. Pages often have other
+        content next to the form, which does not need to be compared for changes.
+        """
+        with self._lock:
+            if self._update_batch:
+                self._update_batch.add(controls)
+            else:
+                self._send_update(controls)
+
+    def _send_update(self, controls: Union[List[Control], None]):
+        if controls and self in controls:
+            controls = [self]
+        with self._timer("page_update"):
+            if not _update_controls(self.page, controls):
+                self._count("full_page_updates")
+
+    def _timer(self, phase: str):
+        """Context manager that times `phase`, if metrics are enabled."""
+        return self.metrics.timer(phase) if self.metrics else no_timer
+
+    def _count(self, counter: str, amount: int = 1):
+        if self.metrics:
+            self.metrics.increment(counter, amount)
+
+
+@dataclasses.dataclass
+class UpdateBatch:
+    requested: int = 0
+    # Controls to update at the end of the batch, by id, in the order requested
+    controls: dict = dataclasses.field(default_factory=dict)
+    # Some update asked for the whole page
+    full: bool = False
+
+    def add(self, controls: tuple):
+        self.requested += 1
+        if not controls:
+            self.full = True
+        for control in controls:
+            self.controls[id(control)] = control
+
+    @property
+    def coalesced(self) -> int:
+        """Number of page updates saved by batching."""
+        return max(self.requested - 1, 0)
+
+
+class SectionControl(Stack):
+    """
+    Collapsible group for the fields of a nested model. The controls for the fields are created when the section is
+    expanded for the first time.
+    """
+
+    def __init__(self, form: Form, field: FieldSpec, **kwargs):
+        super().__init__(**kwargs)
+        self.form = form
+        self.field = field
+        self.built = False
+        self.toggle_button = Button(icon="ChevronRight", text="Show", on_click=self.toggle)
+        self.message = Message(value=field.error_message, type="error", visible=False)
+        self.content = Stack(width="100%", visible=False)
+        self.controls = [self.toggle_button, self.message, self.content]
+
+    @property
+    def expanded(self) -> bool:
+        return self.content.visible
+
+    def toggle(self, event):
+        if self.expanded:
+            self.collapse()
         else:
-            if not self.autosave:
-                self.value.__dict__.update(self.working_copy.__dict__)
-            if self.on_submit:
-                custom_event = ControlEvent(self.submit_button, "submit", None, self, self.page)
-                self.on_submit(custom_event)
+            self.expand()
+        self.form._update_page(self)
+
+    def expand(self):
+        if not self.built:
+            self.content.controls = self.form._create_controls_for_fields(self.field.children, label_above=True)
+            self.built = True
+        # Once expanded, errors are shown on the fields
+        self.message.visible = False
+        self.content.visible = True
+        self.toggle_button.icon = "ChevronDown"
+        self.toggle_button.text = "Hide"
+
+    def collapse(self):
+        self.content.visible = False
+        self.toggle_button.icon = "ChevronRight"
+        self.toggle_button.text = "Show"
+
+
+class SearchableChoice(Stack):
+    """
+    Type-ahead choice for large sets of options. Only the page of options that match the search text is sent to
+    the page, at most `page_size` options at a time.
+
+    `source` is an object with `search(query, offset, limit)` that returns a list of (key, text) tuples and the total
+    number of matches, or None if not known, and `text_for(key)`, like the sources in `form.options`.
+
+    With `multiple`, the value is a list of keys, chosen from a multi-select ComboBox that has the selected options
+    in addition to the matching ones.
+    """
+
+    def __init__(
+        self,
+        source: Any,
+        value: Any = None,
+        page_size: int = 20,
+        on_change: callable = None,
+        multiple: bool = False,
+        **kwargs,
+    ):
+        super().__init__(gap=2, **kwargs)
+        self.source = source
+        self.page_size = page_size
+        self.multiple = multiple
+        self.query = ""
+        self.offset = 0
+        self.total = 0
+        self._on_change = on_change
+
+        self.search_box = Textbox(placeholder="Type to search", on_change=self._handle_search_event)
+        if multiple:
+            self.dropdown = ComboBox(multi_select=True, on_change=self._handle_selection_event)
+        else:
+            self.dropdown = Dropdown(on_change=self._handle_selection_event)
+        # Shown keys by their text on the page, to give selected keys back in their own type
+        self._keys_by_text = {}
+        self.match_info = Text(size="small")
+        self.previous_page_button = Button(icon="ChevronLeft", on_click=self._handle_previous_page_event)
+        self.next_page_button = Button(icon="ChevronRight", on_click=self._handle_next_page_event)
+        self.paging_controls = Stack(
+            horizontal=True,
+            vertical_align="center",
+            controls=[self.previous_page_button, self.match_info, self.next_page_button],
+        )
+        self.controls = [self.search_box, self.dropdown, self.paging_controls]
+
+        self._value = None
+        self.value = value
+
+    @property
+    def value(self) -> Any:
+        return self._value
+
+    @value.setter
+    def value(self, value: Any):
+        self._value = list(value or []) if self.multiple else value
+        self.search(self.query)
+
+    # Property, so that the form can track changes
+    @property
+    def on_change(self) -> callable:
+        return self._on_change
+
+    @on_change.setter
+    def on_change(self, handler: callable):
+        self._on_change = handler
+
+    @property
+    def has_more(self) -> bool:
+        return self.total is None or self.offset + self.page_size < self.total
+
+    def search(self, query: str, offset: int = 0):
+        """Show the page of options matching `query` from `offset`, keeping the selected option available."""
+        self.query = query
+        self.offset = offset
+        options, self.total = self.source.search(query, offset, self.page_size)
+        selected = self._value if self.multiple else [] if self._value is None else [self._value]
+        shown = {key for key, _ in options}
+        options = [(key, self.source.text_for(key)) for key in selected if key not in shown] + options
+        option_type = combobox.Option if self.multiple else dropdown.Option
+        self.dropdown.options = [option_type(key=key, text=text) for key, text in options]
+        self.dropdown.value = self._value
+        self._keys_by_text = {str(key): key for key, _ in options}
+
+        self.paging_controls.visible = self.offset > 0 or self.has_more
+        self.previous_page_button.disabled = self.offset == 0
+        self.next_page_button.disabled = not self.has_more
+        end = f"{self.offset + self.page_size}+" if self.total is None else min(self.offset + self.page_size, self.total)
+        self.match_info.value = f"{self.offset + 1}-{end}" + ("" if self.total is None else f" / {self.total}")
+
+    def _handle_search_event(self, event):
+        self.search(self.search_box.value or "")
+        self._update()
+
+    def _handle_previous_page_event(self, event):
+        self.search(self.query, max(self.offset - self.page_size, 0))
+        self._update()
+
+    def _handle_next_page_event(self, event):
+        if self.has_more:
+            self.search(self.query, self.offset + self.page_size)
+            self._update()
+
+    def _update(self):
+        if self.page:
+            self.update()
+
+    def _handle_selection_event(self, event):
+        value = self.dropdown.value
+        if self.multiple:
+            # Single selection comes as a string, no selection as None or ""
+            texts = value if isinstance(value, list) else [value] if value else []
+            value = [self._keys_by_text.get(text, text) for text in texts]
+        self._value = value
+        if self._on_change:
+            self._on_change(event)
 
 
 class ListControl(Stack):
 
-    def __init__(self, value, attribute_type, form, simple=True, panel_width=None, gap=0, **kwargs):
+    def __init__(
+        self,
+        value,
+        attribute_type,
+        form,
+        simple=True,
+        panel_width=None,
+        gap=0,
+        field=None,
+        page_size=None,
+        **kwargs,
+    ):
         super().__init__(**kwargs)
         self.form = form
+        self.field = field
+        self._item_field = FieldSpec(
+            attribute="",
+            path=field.path if field else tuple(),
+            model=None,
+            attribute_type=attribute_type,
+            kind=BASIC,
+            control_type=(
+                field and field.control_type or resolve_control_type(attribute_type, form.data_to_control_mapping)
+            ),
+            label_text="",
+            placeholder="",
+            error_message="",
+            kwargs={},
+        )
         self.simple = simple
         self.gap = gap
-        self.value = value
         self.attribute_type = attribute_type
         self.panel_width = panel_width
         self.panel = None
         self.panel_holder = Stack()
+
+        # One subform per item type, rebound to the selected item
+        self._subforms = {}
+
+        # Rows are keyed by stable item keys kept in parallel with the items, so that rows can be reused
+        self._key_counter = itertools.count()
+        self._keys = []
+        self._rows = {}
+        self._selected_key = None
+        self.controls_created = 0
+
+        # Only a page of rows is rendered at a time when page_size is set
+        self.page_size = page_size
+        self.offset = 0
+        self.page_info = Text()
+        self.previous_page_button = Button(icon="ChevronLeft", on_click=self.list_previous_page)
+        self.next_page_button = Button(icon="ChevronRight", on_click=self.list_next_page)
+        self.paging_controls = Stack(
+            horizontal=True,
+            horizontal_align="center",
+            vertical_align="center",
+            gap=8,
+            controls=[self.previous_page_button, self.page_info, self.next_page_button],
+        )
+
+        self.value = value
+
+    @property
+    def value(self) -> list:
+        return self._value
+
+    @value.setter
+    def value(self, value: list):
+        self._value = value
+        self._owns_value = False
+        self._keys = [next(self._key_counter) for _ in value]
+        self._rows = {}
         self.update()
 
     def update(self):
+        """
+        Sync the rows with the visible items. Rows of items that are still visible are reused, only the rows for
+        newly visible items are created.
+        """
+        start, end = self._visible_range()
+        visible_keys = self._keys[start:end]
+        rows = {
+            key: self._rows.get(key) or self._create_row(key, self.value[start + offset])
+            for offset, key in enumerate(visible_keys)
+        }
+        self._rows = rows
+        controls = list(rows.values())
+
+        if self._is_paged():
+            self.page_info.value = f"{start + 1}-{end} / {len(self.value)}"
+            self.previous_page_button.disabled = start == 0
+            self.next_page_button.disabled = end == len(self.value)
+            controls.append(self.paging_controls)
+
+        if not self.simple:
+            controls.append(self.panel_holder)
+
+        self.controls = controls
+
+    def _is_paged(self) -> bool:
+        return bool(self.page_size) and len(self.value) > self.page_size
+
+    def _visible_range(self) -> tuple:
+        if not self._is_paged():
+            self.offset = 0
+            return 0, len(self.value)
+        last_page_offset = (len(self.value) - 1) // self.page_size * self.page_size
+        self.offset = max(0, min(self.offset, last_page_offset))
+        return self.offset, min(self.offset + self.page_size, len(self.value))
+
+    def _create_row(self, key: int, item: Any) -> Stack:
         if self.simple:
-            self.controls = [
-                Stack(
-                    gap=2,
-                    horizontal=True,
-                    controls=[
-                        self.get_value_control(item, index),
-                        Button(height="100%", icon="Delete", on_click=partial(self.list_delete, index)),
-                    ],
-                )
-                for index, item in enumerate(self.value)
+            controls = [
+                self.get_value_control(item, key),
+                Button(height="100%", icon="Delete", on_click=partial(self._handle_delete_event, key)),
             ]
+            row = Stack(gap=2, horizontal=True, controls=controls)
         else:
-            self.controls = [
-                Stack(
-                    gap=0,
-                    horizontal=True,
-                    # border_top="1px solid lightgray",
-                    controls=[
-                        Button(width="100%", text=str(item), action=True, on_click=partial(self.list_selection, item)),
-                        Button(height="100%", icon="Delete", on_click=partial(self.list_delete, index)),
-                        Button(height="100%", icon="ChevronRight", on_click=partial(self.list_selection, item)),
-                    ],
-                )
-                for index, item in enumerate(self.value)
-            ] + [self.panel_holder]
-
-    def get_value_control(self, item: Any, index: int) -> Control:
-        control_data = ControlData(
-            attribute="",
-            attribute_type=self.attribute_type,
-            value=item,
-            label_text="",
-            placeholder="",
-            error_message="",
-            kwargs={},
-        )
-        control = self.form._create_basic_control(control_data)
+            controls = [
+                Button(width="100%", text=str(item), action=True, on_click=partial(self._handle_selection_event, key)),
+                Button(height="100%", icon="Delete", on_click=partial(self._handle_delete_event, key)),
+                Button(height="100%", icon="ChevronRight", on_click=partial(self._handle_selection_event, key)),
+            ]
+            row = Stack(
+                gap=0,
+                horizontal=True,
+                # border_top="1px solid lightgray",
+                controls=controls,
+            )
+        self.controls_created += len(controls) + 1
+        self.form._count("controls_created", len(controls) + 1)
+        return row
+
+    def _patch_row(self, key: int):
+        row = self._rows.get(key)
+        if not row:
+            return
+        item = self.value[self._keys.index(key)]
+        if self.simple:
+            row.controls[0].value = item
+        else:
+            row.controls[0].text = str(item)
+
+    def _replace_items(self, value: list):
+        """
+        Take the validated `value` of the list in place of the current one. Rows are kept for items at the same
+        positions, and only the rows of the items that were replaced are patched.
+        """
+        if len(value) != len(self._keys):
+            self.value = value
+            return
+        replaced = [key for key, old_item, item in zip(self._keys, self._value, value) if item is not old_item]
+        if value is not self._value:
+            self._value = value
+            self._owns_value = False
+        for key in replaced:
+            self._patch_row(key)
+
+    def show_page(self, offset: int):
+        self.offset = offset
+        self.update()
+        _update_controls(self.page, [self])
+
+    def list_previous_page(self, event):
+        self.show_page(self.offset - self.page_size)
+
+    def list_next_page(self, event):
+        self.show_page(self.offset + self.page_size)
+
+    def get_value_control(self, item: Any, key: int) -> Control:
+        control = self.form._create_basic_control(self._item_field, item)
         control.width = "100%"
-        control.on_change = partial(self.list_change, index)
+        control.on_change = partial(self._handle_change_event, key)
         return control
 
+    def _handle_change_event(self, key, event):
+        self.list_change(self._keys.index(key), event)
+
+    def _handle_selection_event(self, key, event):
+        self._selected_key = key
+        self.list_selection(self.value[self._keys.index(key)], event)
+
+    def _own_value(self):
+        """
+        Copy the list on first change, so that the original value is changed only when the form is submitted.
+        """
+        if self._owns_current_value():
+            return
+        self._value = list(self._value)
+        self._owns_value = True
+        if self.field:
+            self.form.working_copy.set(self.field.path, self._value)
+
+    def _owns_current_value(self) -> bool:
+        """
+        True if the list is the copy made by this control and not committed yet. Once the form commits the copy to
+        the original value, the next change copies the list again.
+        """
+        if not self._owns_value:
+            return False
+        working_copy = self.form.working_copy
+        if not self.field or working_copy.write_through:
+            return True
+        return working_copy.changes.get(self.field.path) is self._value
+
+    def _handle_delete_event(self, key, event):
+        self.list_delete(self._keys.index(key), event)
+
     def list_change(self, index, event):
+        self._own_value()
         self.value[index] = event.control.value
+        self._mark_dirty()
 
     def list_selection(self, item, event):
-        subform = Form(value=item, on_submit=self._handle_subform_submit_event)
-        self.panel = Panel(
-            open=True,
-            type='custom',
-            auto_dismiss=False,
-            light_dismiss=True,
-            title=type(item).__name__.capitalize(),
-            controls=[subform],
-            on_dismiss=self._handle_subform_dismiss_event
-        )
-        if self.panel_width:
-            self.panel.width = self.panel_width
-        self.panel_holder.controls.append(self.panel)
+        if self._selected_key not in self._keys or self.value[self._keys.index(self._selected_key)] is not item:
+            self._selected_key = next(key for key, value in zip(self._keys, self.value) if value is item)
+
+        # Subform edits a shallow copy that replaces the item on submit
+        item = shallow_copy(item)
+        subform = self._subforms.get(type(item))
+        if subform and subform.can_rebind(item):
+            subform.rebind(item)
+        else:
+            subform = self._subforms[type(item)] = Form(value=item, on_submit=self._handle_subform_submit_event)
+
+        if not self.panel:
+            self.panel = Panel(
+                type='custom',
+                auto_dismiss=False,
+                light_dismiss=True,
+                on_dismiss=self._handle_subform_dismiss_event
+            )
+            if self.panel_width:
+                self.panel.width = self.panel_width
+            self.panel_holder.controls.append(self.panel)
+
+        self.panel.title = type(item).__name__.capitalize()
+        self.panel.controls = [subform]
+        self.panel.open = True
         self.panel_holder.update()
 
     def list_delete(self, index, event):
+        self._own_value()
         del self.value[index]
+        del self._keys[index]
+        self._mark_dirty()
         self.update()
-        self.page.update()
+        _update_controls(self.page, [self])
 
     def list_add(self, event):
+        self._own_value()
         self.value.append(self.attribute_type())
+        self._keys.append(next(self._key_counter))
+        self._selected_key = self._keys[-1]
+        self._mark_dirty()
+        if self.page_size:
+            self.offset = (len(self.value) - 1) // self.page_size * self.page_size
         self.update()
-        self.page.update()
-        self.list_selection(self.value[-1], event)
+        _update_controls(self.page, [self])
+        if not self.simple:
+            self.list_selection(self.value[-1], event)
+
+    def list_move(self, index, delta, event=None):
+        """Move the item at `index` by `delta` positions, reusing the rows of the items."""
+        new_index = max(0, min(len(self.value) - 1, index + delta))
+        self._own_value()
+        self.value.insert(new_index, self.value.pop(index))
+        self._keys.insert(new_index, self._keys.pop(index))
+        self._mark_dirty()
+        self.update()
+        _update_controls(self.page, [self])
 
     def _handle_subform_submit_event(self, event):
-        self.update()
-        self.page.update()
+        self._own_value()
+        self.value[self._keys.index(self._selected_key)] = event.control.value
+        self._mark_dirty()
+        self._patch_row(self._selected_key)
+        _update_controls(self.page, [self._rows.get(self._selected_key) or self])
         self._handle_subform_dismiss_event(event)
 
+    def _mark_dirty(self):
+        if self.field:
+            self.form._mark_dirty(self.field.path)
+
     def _handle_subform_dismiss_event(self, event):
-        self.panel_holder.controls.pop()
+        # The panel and the subforms are kept for reuse, only closed
+        self.panel.open = False
         self.panel_holder.update()
 
 
-@dataclasses.dataclass
-class ControlData:
-    attribute: str
-    attribute_type: Any
-    value: Any
-    label_text: str
-    placeholder: str
-    error_message: str
-    kwargs: dict
+class GridListControl(ListControl):
+    """
+    List of models edited as a table, with a column for each field of the item model and a row for each item.
+    Cells are edited in place, and each row is validated when one of its cells changes. Rows can also be pasted from
+    a spreadsheet, one item per line with tab-separated columns.
+    """
+
+    def __init__(self, value, attribute_type, form, **kwargs):
+        item_schema = form.schema_cache.get(
+            attribute_type,
+            form.data_to_control_mapping,
+            field_validation_default_error_message=form.field_validation_default_error_message,
+            threshold_for_dropdown=form.threshold_for_dropdown,
+            # Nested models are shown as text
+            max_depth=1,
+        )
+        self.columns = item_schema.fields
+        self.column_width = f"{100 // max(len(self.columns), 1)}%"
+        self.header = Stack(
+            horizontal=True,
+            gap=2,
+            controls=[
+                Stack(horizontal=True, width="100%", controls=[
+                    Text(value=column.label_text, bold=True, width=self.column_width) for column in self.columns
+                ]),
+                # Room for the delete button
+                Button(icon="Delete", disabled=True, visible=False),
+            ],
+        )
+        self.paste_box = Textbox(multiline=True, placeholder="Paste rows here, columns separated by tabs")
+        self.paste_button = Button(text="Add pasted rows", on_click=self._handle_paste_event)
+        self.paste_area = Stack(horizontal=True, vertical_align="end", controls=[self.paste_box, self.paste_button])
+
+        self._cells = {}
+        self._row_messages = {}
+        self._owned_keys = set()
+        # Validation errors by row key
+        self.row_errors = {}
+
+        super().__init__(value, attribute_type, form, simple=False, **kwargs)
+
+    @ListControl.value.setter
+    def value(self, value: list):
+        self._cells = {}
+        self._row_messages = {}
+        self._owned_keys = set()
+        self.row_errors = {}
+        ListControl.value.fset(self, value)
+
+    def _replace_items(self, value: list):
+        # Items replaced by validation are not the copies made by this control
+        self._owned_keys.difference_update(
+            key for key, old_item, item in zip(self._keys, self._value, value) if item is not old_item
+        )
+        super()._replace_items(value)
+
+    @property
+    def error_summary(self) -> str:
+        rows = sorted(self._keys.index(key) + 1 for key in self.row_errors if key in self._keys)
+        return f"Check row{'s' if len(rows) > 1 else ''} {', '.join(str(row) for row in rows)}"
+
+    def update(self):
+        super().update()
+        # Forget the cells of the rows that are no longer shown
+        self._cells = {key: self._cells[key] for key in self._rows}
+        self._row_messages = {key: self._row_messages[key] for key in self._rows}
+        rows = [control for control in self.controls if control is not self.panel_holder]
+        self.controls = [self.header] + rows + [self.paste_area]
+
+    def _create_row(self, key: int, item: Any) -> Stack:
+        cells = self._cells[key] = {}
+        for column in self.columns:
+            cell = cells[column.attribute] = self._create_cell(column, getattr(item, column.attribute, None))
+            cell.width = self.column_width
+            if hasattr(cell, "on_change"):
+                cell.on_change = partial(self._handle_cell_change_event, key, column)
+
+        message = self._row_messages[key] = Text(
+            value=self.row_errors.get(key, ""), color="red", size="small", visible=key in self.row_errors
+        )
+        row = Stack(gap=0, controls=[
+            Stack(horizontal=True, gap=2, controls=[
+                Stack(horizontal=True, width="100%", controls=list(cells.values())),
+                Button(height="100%", icon="Delete", on_click=partial(self._handle_delete_event, key)),
+            ]),
+            message,
+        ])
+        self.controls_created += len(cells) + 5
+        self.form._count("controls_created", len(cells) + 5)
+        return row
+
+    def _create_cell(self, column: FieldSpec, value: Any) -> Control:
+        if _is_unparsed(column, value):
+            # Pasted text that is not a number or a choice, kept for the user to fix
+            return Textbox(value=value)
+        if column.kind == BASIC:
+            return self.form._create_basic_control(column, value)
+        if column.kind == CHOICE:
+            return self.form._create_choice_control(column, value)
+        return Text(value=str(value))
+
+    def _patch_row(self, key: int):
+        item = self.value[self._keys.index(key)]
+        for column in self.columns:
+            cell = self._cells.get(key, {}).get(column.attribute)
+            if cell is not None and column.kind in (BASIC, CHOICE):
+                value = getattr(item, column.attribute)
+                if not _is_unparsed(column, value):
+                    value = self.form._to_control_value(column, value)
+                cell.value = value.isoformat() if type(value) is datetime.date else value
+        message = self._row_messages.get(key)
+        if message:
+            message.value = self.row_errors.get(key, "")
+            message.visible = key in self.row_errors
+
+    def _own_value(self):
+        if not self._owns_current_value():
+            # The items of a new copy of the list are shared with the original value
+            self._owned_keys = set()
+        super()._own_value()
+
+    def _own_item(self, key: int) -> Any:
+        """Replace the item with a copy on first change, so that the original item is not changed before submit."""
+        self._own_value()
+        index = self._keys.index(key)
+        if key not in self._owned_keys:
+            self.value[index] = shallow_copy(self.value[index])
+            self._owned_keys.add(key)
+        return self.value[index]
+
+    def _handle_cell_change_event(self, key: int, column: FieldSpec, event):
+        item = self._own_item(key)
+        value = self._cells[key][column.attribute].value
+        if isinstance(value, str):
+            value = _parse_cell(column, value)
+        setattr(item, column.attribute, value)
+        self._mark_dirty()
+        self.validate_row(key)
+        row = self._rows.get(key)
+        if row is not None and row.page:
+            # Validation can change the values in the cells too, not only the message
+            self.form._update_page(row)
+
+    def validate_row(self, key: int) -> bool:
+        """
+        Validate the item of the row. Pydantic items are validated with the model, other items only for text that is
+        not a number or a choice in those columns. Validated values replace the values in the item.
+        """
+        item = self.value[self._keys.index(key)]
+        errors = []
+        if validate_model and hasattr(type(item), "__fields__"):
+            validated, _, validation_error = validate_model(type(item), dict(item.__dict__))
+            labels = {column.attribute: column.label_text for column in self.columns}
+            for error in validation_error and validation_error.errors() or []:
+                errors.append(f"{labels.get(error['loc'][0], error['loc'][0])}: {error['msg']}")
+            if not errors and key in self._owned_keys:
+                for column in self.columns:
+                    setattr(item, column.attribute, validated[column.attribute])
+        else:
+            for column in self.columns:
+                if _is_unparsed(column, getattr(item, column.attribute, None)):
+                    expected = "choice" if column.kind == CHOICE else "number"
+                    errors.append(f"{column.label_text}: value is not a valid {expected}")
+
+        if errors:
+            self.row_errors[key] = "; ".join(errors)
+        else:
+            self.row_errors.pop(key, None)
+        self._patch_row(key)
+        return not errors
+
+    def list_selection(self, item, event):
+        # Rows are edited in place
+        self._selected_key = next(key for key, value in zip(self._keys, self.value) if value is item)
+
+    def list_delete(self, index, event):
+        self.row_errors.pop(self._keys[index], None)
+        super().list_delete(index, event)
+
+    def paste_rows(self, text: str) -> int:
+        """
+        Add an item for each line of `text`, with the tab-separated values in column order. Returns the number of rows
+        added.
+        """
+        lines = [line for line in text.splitlines() if line.strip()]
+        self._own_value()
+        for line in lines:
+            item = self.attribute_type()
+            for column, cell_text in zip(self.columns, line.split("\t")):
+                if column.kind in (BASIC, CHOICE):
+                    setattr(item, column.attribute, _parse_cell(column, cell_text.strip()))
+            key = next(self._key_counter)
+            self.value.append(item)
+            self._keys.append(key)
+            self._owned_keys.add(key)
+            self.validate_row(key)
+        if lines:
+            self._mark_dirty()
+            if self.page_size:
+                self.offset = (len(self.value) - 1) // self.page_size * self.page_size
+            self.update()
+        return len(lines)
+
+    def _handle_paste_event(self, event):
+        if self.paste_rows(self.paste_box.value or ""):
+            self.paste_box.value = ""
+            _update_controls(self.page, [self])
+
+
+def _update_controls(page: Any, controls: Union[List[Control], None]) -> bool:
+    """
+    Send the changes in the subtrees of `controls` to the page. The whole page is updated instead if no controls are
+    given or some of them are not on the page yet. Returns True if only the subtrees were updated.
+    """
+    if controls and all(control.uid and page.get_control(control.uid) is control for control in controls):
+        page.update(*controls)
+        return True
+    page.update()
+    return False
+
+
+def _value_at(value: Any, path: tuple) -> Any:
+    """Value at `path` from `value`, or None if some value along the path is not set."""
+    for attribute_name in path:
+        if value is None:
+            return None
+        value = getattr(value, attribute_name)
+    return value
+
+
+def _is_number_type(attribute_type: Any) -> bool:
+    return (
+        isinstance(attribute_type, type)
+        and issubclass(attribute_type, (int, float))
+        and not issubclass(attribute_type, bool)
+    )
+
+
+def _is_unparsed(column: FieldSpec, value: Any) -> bool:
+    """True for text in a number or choice column that could not be parsed, like a pasted typo."""
+    if not isinstance(value, str):
+        return False
+    if column.kind == CHOICE:
+        return not isinstance(_parse_choice(column.attribute_type, value), column.attribute_type)
+    return column.kind == BASIC and _is_number_type(column.attribute_type)
+
+
+def _parse_choice(enum_type: Any, text: str) -> Any:
+    """Member of `enum_type` with `text` as its value or name, in any case, or the text if there is none."""
+    folded = text.lower()
+    for member in enum_type:
+        if folded in (str(member.value).lower(), member.name.lower()):
+            return member
+    return text
+
+
+def _parse_cell(column: FieldSpec, text: str) -> Any:
+    if column.kind == CHOICE:
+        return _parse_choice(column.attribute_type, text)
+    if column.attribute_type is bool:
+        return text.lower() in ("1", "true", "yes", "x")
+    if _is_number_type(column.attribute_type):
+        number_type = float if issubclass(column.attribute_type, float) else int
+        try:
+            return number_type(text)
+        except ValueError:
+            return text
+    return text
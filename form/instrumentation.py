@@ -0,0 +1,130 @@
+"""
+Timings and counters for forms.
+
+A form with metrics enabled has a `FormMetrics` that records how long each phase took (schema, controls,
+working_copy, validate_field, validate_model, commit, submit, submit_handler, page_update) and counts things like
+the controls created, the validations run and the updates that had to compare the whole page for changes
+(full_page_updates), because some of the changed controls were not on the page. Each measurement is also passed on
+to an optional sink, like the process-wide `MetricsCollector`, which aggregates the measurements of all forms by
+model and renders them in the Prometheus text format:
+
+    Form.metrics_sink = collector
+    ...
+    return collector.prometheus_text()
+
+Forms without metrics skip all of this with a single attribute check.
+"""
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+
+__all__ = ["FormMetrics", "MetricsCollector", "collector", "no_timer"]
+
+# Returned instead of a timer when metrics are not enabled
+no_timer = nullcontext()
+
+
+class FormMetrics:
+    """Timings and counters of one form. Totals are kept per phase and per counter."""
+
+    def __init__(self, model_name: str, sink=None):
+        self.model_name = model_name
+        self.sink = sink
+        self.timings = defaultdict(float)
+        self.timing_counts = defaultdict(int)
+        self.counters = defaultdict(int)
+
+    def timer(self, phase: str) -> "_Timer":
+        return _Timer(self, phase)
+
+    def observe(self, phase: str, seconds: float):
+        self.timings[phase] += seconds
+        self.timing_counts[phase] += 1
+        if self.sink:
+            self.sink.observe(self.model_name, phase, seconds)
+
+    def increment(self, counter: str, amount: int = 1):
+        self.counters[counter] += amount
+        if self.sink:
+            self.sink.increment(self.model_name, counter, amount)
+
+
+class _Timer:
+
+    __slots__ = ("metrics", "phase", "start")
+
+    def __init__(self, metrics: FormMetrics, phase: str):
+        self.metrics = metrics
+        self.phase = phase
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.phase, time.perf_counter() - self.start)
+        return False
+
+
+class MetricsCollector:
+    """
+    Thread-safe sink that aggregates the measurements of all forms in the process, by model name.
+    """
+
+    def __init__(self, prefix: str = "pglet_form"):
+        self.prefix = prefix
+        self._timings = defaultdict(lambda: [0, 0.0])
+        self._counters = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def observe(self, model_name: str, phase: str, seconds: float):
+        with self._lock:
+            timing = self._timings[(model_name, phase)]
+            timing[0] += 1
+            timing[1] += seconds
+
+    def increment(self, model_name: str, counter: str, amount: int = 1):
+        with self._lock:
+            self._counters[(model_name, counter)] += amount
+
+    def clear(self):
+        with self._lock:
+            self._timings.clear()
+            self._counters.clear()
+
+    def prometheus_text(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            timings = sorted((key, list(value)) for key, value in self._timings.items())
+            counters = sorted(self._counters.items())
+
+        name = f"{self.prefix}_phase_seconds"
+        lines = [
+            f"# HELP {name} Time spent in each phase of building, validating and submitting forms.",
+            f"# TYPE {name} summary",
+        ]
+        for (model_name, phase), (count, total) in timings:
+            labels = _labels(model=model_name, phase=phase)
+            lines.append(f"{name}_count{labels} {count}")
+            lines.append(f"{name}_sum{labels} {total!r}")
+
+        for counter in sorted({counter for (_, counter), _ in counters}):
+            name = f"{self.prefix}_{counter}_total"
+            lines.append(f"# TYPE {name} counter")
+            for (model_name, counter_name), value in counters:
+                if counter_name == counter:
+                    lines.append(f"{name}{_labels(model=model_name)} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+collector = MetricsCollector()
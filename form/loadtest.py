@@ -0,0 +1,310 @@
+"""
+Load tests for pglet apps, without a pglet server.
+
+`run_load_test` starts a number of simulated sessions of an app, each on its own `RecordingPage`, like the pglet
+server would for that many users, and replays a script of clicks, edits and submits in all of the sessions at the
+same time. Events are dispatched like pglet dispatches them, except that the handler is called in the thread of the
+session instead of a new thread, so that its latency can be measured:
+
+    report = run_load_test(FormDemoApp, [
+        click(text="Validation"),
+        edit("Jane", kind="textbox"),
+        submit(),
+    ], sessions=50)
+    print(report.format())
+
+Controls are found by their pglet control name and attribute values, in the order they are on the page. The report
+has the memory, handler latencies and updates of each session, and the latency percentiles and update throughput over
+all of them. Memory is measured with tracemalloc, which slows the handlers down, so use `trace_memory=False` for
+latencies closer to production.
+
+From the command line, with the script as a JSON list of steps like `{"action": "click", "text": "Validation"}`:
+
+    python -m form.loadtest main:FormDemoApp --sessions 50 --script script.json
+"""
+import argparse
+import dataclasses
+import gc
+import importlib
+import json
+import math
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from typing import Callable
+from typing import List
+
+from pglet.control_event import ControlEvent
+from pglet.event import Event
+
+from form import Form
+from form.testing import RecordingConnection
+from form.testing import RecordingPage
+
+__all__ = ["LoadTestReport", "SessionStats", "Step", "click", "edit", "run_load_test", "submit", "wait"]
+
+
+@dataclasses.dataclass
+class Step:
+    """One user action: "click", "edit", "submit" or "wait"."""
+    action: str
+    # Pglet control name, like "button" or "textbox", and the attribute values of the control
+    kind: str = None
+    attrs: dict = dataclasses.field(default_factory=dict)
+    # Which of the matching controls, in page order
+    nth: int = 0
+    value: Any = None
+    seconds: float = 0
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Step":
+        fields = {name: data[name] for name in ("action", "kind", "nth", "value", "seconds") if name in data}
+        attrs = {name: value for name, value in data.items() if name not in fields}
+        return cls(attrs=attrs, **fields)
+
+
+def click(kind: str = "button", nth: int = 0, **attrs) -> Step:
+    return Step("click", kind, attrs, nth)
+
+
+def edit(value: Any, kind: str = "textbox", nth: int = 0, **attrs) -> Step:
+    return Step("edit", kind, attrs, nth, value)
+
+
+def submit(nth: int = 0) -> Step:
+    """Click the submit button of the `nth` form on the page."""
+    return Step("submit", nth=nth)
+
+
+def wait(seconds: float) -> Step:
+    return Step("wait", seconds=seconds)
+
+
+@dataclasses.dataclass
+class SessionStats:
+    session_id: str
+    # Memory allocated by starting the session and still in use after it, in bytes, None if not traced
+    memory: int = None
+    events: int = 0
+    errors: List[str] = dataclasses.field(default_factory=list)
+    handler_seconds: List[float] = dataclasses.field(default_factory=list)
+    updates: int = 0
+    commands: int = 0
+    bytes: int = 0
+
+
+@dataclasses.dataclass
+class LoadTestReport:
+    sessions: List[SessionStats]
+    # Seconds it took to run the scripts in all of the sessions
+    wall_time: float
+    # Growth of the memory in use while the scripts ran, per session, in bytes, None if not traced
+    memory_growth: float = None
+
+    @property
+    def handler_seconds(self) -> List[float]:
+        return sorted(seconds for session in self.sessions for seconds in session.handler_seconds)
+
+    def percentile(self, percent: float) -> float:
+        """Handler latency percentile over all sessions, in seconds."""
+        return _percentile(self.handler_seconds, percent)
+
+    @property
+    def updates_per_second(self) -> float:
+        return sum(session.updates for session in self.sessions) / self.wall_time if self.wall_time else 0.0
+
+    def format(self) -> str:
+        total = SessionStats("total")
+        for session in self.sessions:
+            total.events += session.events
+            total.errors.extend(session.errors)
+            total.updates += session.updates
+            total.commands += session.commands
+            total.bytes += session.bytes
+        per_second = (lambda amount: amount / self.wall_time) if self.wall_time else (lambda amount: 0.0)
+        latencies = self.handler_seconds
+
+        lines = [
+            f"Sessions: {len(self.sessions)}, events: {total.events}, errors: {len(total.errors)}, "
+            f"wall time: {self.wall_time:.2f} s",
+            "Handler latency ms: " + "  ".join(
+                f"p{percent} {_percentile(latencies, percent) * 1000:.1f}" for percent in (50, 90, 99)
+            ) + f"  max {(latencies[-1] if latencies else 0) * 1000:.1f}",
+            f"Updates: {total.updates} ({per_second(total.updates):.1f}/s), "
+            f"commands: {total.commands} ({per_second(total.commands):.1f}/s), "
+            f"bytes: {total.bytes} ({per_second(total.bytes) / 1024:.1f} KB/s)",
+        ]
+        memories = [session.memory for session in self.sessions if session.memory is not None]
+        if memories:
+            lines.append(
+                f"Memory per session: mean {sum(memories) / len(memories) / 1024:.1f} KB, "
+                f"max {max(memories) / 1024:.1f} KB, growth during the run {self.memory_growth / 1024:.1f} KB"
+            )
+
+        lines.append(f"{'session':<12}{'memory KB':>10}{'events':>8}{'errors':>8}{'p50 ms':>8}{'p99 ms':>8}"
+                     f"{'updates':>9}")
+        for session in self.sessions:
+            session_latencies = sorted(session.handler_seconds)
+            memory = "-" if session.memory is None else f"{session.memory / 1024:.1f}"
+            lines.append(
+                f"{session.session_id:<12}{memory:>10}{session.events:>8}{len(session.errors):>8}"
+                f"{_percentile(session_latencies, 50) * 1000:>8.1f}{_percentile(session_latencies, 99) * 1000:>8.1f}"
+                f"{session.updates:>9}"
+            )
+        for error in sorted(set(total.errors)):
+            lines.append(f"Error: {error}")
+        return "\n".join(lines)
+
+
+def run_load_test(
+    target: Callable,
+    script: List[Step],
+    sessions: int = 10,
+    repeat: int = 1,
+    concurrency: int = None,
+    trace_memory: bool = True,
+) -> LoadTestReport:
+    """
+    Start `sessions` sessions of `target`, which is called with the page of each session, like the target of
+    `pglet.app`, and run the `script` `repeat` times in each of them, in at most `concurrency` threads at a time.
+    """
+    tracing = trace_memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    try:
+        # Sessions are started one at a time, to tell how much memory each of them takes
+        simulated = [_SimulatedSession(target, f"session-{index}", trace_memory) for index in range(sessions)]
+        memory_before = _memory_in_use() if trace_memory else None
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency or sessions or 1) as executor:
+            list(executor.map(lambda session: session.run(script, repeat), simulated))
+        wall_time = time.perf_counter() - start
+
+        memory_growth = (_memory_in_use() - memory_before) / max(sessions, 1) if trace_memory else None
+    finally:
+        if tracing:
+            tracemalloc.stop()
+
+    return LoadTestReport([session.stats for session in simulated], wall_time, memory_growth)
+
+
+class _SimulatedSession:
+
+    def __init__(self, target: Callable, session_id: str, trace_memory: bool):
+        self.stats = SessionStats(session_id)
+        memory_before = _memory_in_use() if trace_memory else None
+
+        self.page = RecordingPage(RecordingConnection(page_name="loadtest"), session_id=session_id)
+        self.app = target(self.page)
+
+        if trace_memory:
+            self.stats.memory = _memory_in_use() - memory_before
+
+    def run(self, script: List[Step], repeat: int):
+        with self.page.recording() as recording:
+            for _ in range(repeat):
+                for step in script:
+                    try:
+                        self.run_step(step)
+                    except Exception as error:
+                        self.stats.errors.append(f"{step.action} {step.kind or ''}: {type(error).__name__}: {error}")
+        self.stats.updates = recording.updates
+        self.stats.commands = recording.commands
+        self.stats.bytes = recording.bytes
+
+    def run_step(self, step: Step):
+        if step.action == "wait":
+            time.sleep(step.seconds)
+        elif step.action == "click":
+            self.dispatch(self.find(step), "click")
+        elif step.action == "edit":
+            self.dispatch(self.find(step), "change", step.value)
+        elif step.action == "submit":
+            forms = [control for control in self.controls() if isinstance(control, Form)]
+            self.dispatch(forms[step.nth].submit_button, "click")
+        else:
+            raise ValueError(f"Unknown action {step.action!r}")
+
+    def controls(self) -> List[Any]:
+        """All controls on the page, depth first, in page order."""
+        result = []
+        stack = list(reversed(self.page.controls))
+        while stack:
+            control = stack.pop()
+            result.append(control)
+            stack.extend(reversed(control._get_children()))
+        return result
+
+    def find(self, step: Step) -> Any:
+        matches = [
+            control for control in self.controls()
+            if (step.kind is None or control._get_control_name() == step.kind)
+            and all(getattr(control, name, None) == value for name, value in step.attrs.items())
+        ]
+        if len(matches) <= step.nth:
+            raise LookupError(f"No {step.nth + 1}. control matching {step.attrs}")
+        return matches[step.nth]
+
+    def dispatch(self, control: Any, name: str, value: Any = None):
+        """Send the event like the browser would: changed values first, then the event, to its handler."""
+        if not control.uid:
+            raise LookupError(f"{control._get_control_name()} is not on the page")
+        data = None
+        if name == "change":
+            data = ("true" if value else "false") if isinstance(value, bool) else str(value)
+            self.page.on_event(Event("page", "change", json.dumps([{"i": control.uid, "value": data}])))
+
+        handler = control.event_handlers.get(name)
+        self.stats.events += 1
+        if handler:
+            start = time.perf_counter()
+            handler(ControlEvent(control.uid, name, data, control, self.page))
+            self.stats.handler_seconds.append(time.perf_counter() - start)
+
+
+def _memory_in_use() -> int:
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    """Nearest-rank percentile, 0 for no values."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(percent / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def _import(name: str) -> Any:
+    module_name, _, attribute = name.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def main(arguments: List[str] = None):
+    parser = argparse.ArgumentParser(description="Run simulated sessions of a pglet app without a pglet server.")
+    parser.add_argument("target", help="Target of the app, like main:FormDemoApp")
+    parser.add_argument("--script", required=True, help="JSON file with the list of steps to run in each session")
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=1, help="How many times to run the script in each session")
+    parser.add_argument("--concurrency", type=int, default=None, help="Sessions running at a time, default all")
+    parser.add_argument("--no-memory", action="store_true", help="Do not trace memory, for more accurate latencies")
+    options = parser.parse_args(arguments)
+
+    with open(options.script) as script_file:
+        script = [Step.from_dict(step) for step in json.load(script_file)]
+
+    report = run_load_test(
+        _import(options.target),
+        script,
+        sessions=options.sessions,
+        repeat=options.repeat,
+        concurrency=options.concurrency,
+        trace_memory=not options.no_memory,
+    )
+    print(report.format())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Options for choice fields.
+
+The options of an enum are the same for every form that shows it, so they are built once per enum class. Enums with
+more options than fit comfortably in a dropdown are shown with a `SearchableChoice` control, which asks an option
+source for a page of the options matching the search text instead of sending all of them to the browser.
+
+Fields can also get their options from an option provider declared in the pglet options of the field:
+
+    customer_id: str = field(default="", metadata={"pglet": {"option_provider": find_customers}})
+
+The provider is called with the search text, offset and limit, and returns at most `limit` options starting with
+the search text, as keys or (key, text) tuples, in the order they should be shown. The limit is one more than the
+options shown on a page, to tell whether there is a next page.
+
+The pages a provider returns are cached for all the forms that use it, for `max_age` seconds. When the options change,
+like when a customer is added, clear the cache to show the change right away:
+
+    provider_option_source(find_customers).clear()
+
+The source is shared, so its `max_age` can also be set once for all the forms, and None keeps the pages until they are
+evicted by newer queries.
+"""
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any
+from typing import Callable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+__all__ = ["EnumOptions", "ProviderOptions", "enum_option_source", "enum_options", "provider_option_source"]
+
+
+@lru_cache(maxsize=None)
+def enum_options(enum_type: Any) -> Tuple[Tuple[Any, str], ...]:
+    """Keys and texts of the options for the members of `enum_type`."""
+    return tuple((member.value, member.value.title()) for member in enum_type)
+
+
+class EnumOptions:
+    """Option source for the members of an enum, searched by key and text."""
+
+    def __init__(self, enum_type: Any):
+        self.options = enum_options(enum_type)
+        self._texts = dict(self.options)
+        self._search_texts = [f"{key} {text}".lower() for key, text in self.options]
+
+    def search(self, query: str, offset: int = 0, limit: int = 20) -> Tuple[List[Tuple[Any, str]], Optional[int]]:
+        """
+        Options that contain `query` in their key or text, case-insensitively. Returns the options from `offset`,
+        at most `limit` of them, and the total number of matching options, or None if the total is not known.
+        """
+        query = query.strip().lower()
+        if not query:
+            return list(self.options[offset:offset + limit]), len(self.options)
+        matches = [option for option, text in zip(self.options, self._search_texts) if query in text]
+        return matches[offset:offset + limit], len(matches)
+
+    def text_for(self, key: Any) -> str:
+        return self._texts.get(key, str(key))
+
+
+class ProviderOptions:
+    """
+    Option source that asks an option provider for a page of options at a time. The results of the most recent
+    queries are kept in an LRU cache of `maxsize` pages, each for `max_age` seconds, or until evicted if None.
+    """
+
+    def __init__(self, provider: Callable, maxsize: int = 256, max_age: Optional[float] = 60):
+        self.provider = provider
+        self.maxsize = maxsize
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def search(self, query: str, offset: int = 0, limit: int = 20) -> Tuple[List[Tuple[Any, str]], Optional[int]]:
+        """
+        Options for the `query` prefix from `offset`, at most `limit` of them, and the total number of options if
+        the last page has been reached, otherwise None.
+        """
+        key = (query, offset, limit)
+        with self._lock:
+            cached = self._pages.get(key)
+            if cached is not None and (self.max_age is None or time.monotonic() - cached[1] < self.max_age):
+                self._pages.move_to_end(key)
+                self.hits += 1
+                return cached[0]
+            self.misses += 1
+
+        # Ask for one more, to know if there is another page
+        options = [_option(item) for item in self.provider(query, offset, limit + 1)]
+        page = options[:limit], None if len(options) > limit else offset + len(options)
+
+        with self._lock:
+            self._pages[key] = page, time.monotonic()
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.maxsize:
+                self._pages.popitem(last=False)
+        return page
+
+    def text_for(self, key: Any) -> str:
+        with self._lock:
+            pages = list(self._pages.values())
+        for (options, _), _ in pages:
+            for option_key, text in options:
+                if option_key == key:
+                    return text
+        return str(key)
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+
+def _option(item: Any) -> Tuple[Any, str]:
+    return item if isinstance(item, tuple) else (item, str(item))
+
+
+@lru_cache(maxsize=None)
+def enum_option_source(enum_type: Any) -> EnumOptions:
+    return EnumOptions(enum_type)
+
+
+@lru_cache(maxsize=None)
+def provider_option_source(provider: Callable) -> ProviderOptions:
+    """Option source for the provider, shared by all the forms that use it, and so is the cache."""
+    return ProviderOptions(provider)
@@ -0,0 +1,443 @@
+"""
+Precompiled form schemas.
+
+Compiling a schema walks the annotations of the model and its nested models, applies the field overrides and resolves
+the control types. A build step can do that once and save the result, so that the application loads it at startup
+instead:
+
+    # At build time
+    export_schemas("schemas.json", [Person, Address], toggle_for_bool=True)
+
+    # At startup, with the same form options
+    load_schemas("schemas.json", toggle_for_bool=True)
+
+The options are the `Form` options that affect the schema. Loaded schemas are added to `Form.schema_cache`, where the
+forms created with the same options find them. List items are edited in forms with the default options, so list the
+item models too, and export them with the default options if the other forms use others.
+
+Classes, functions and control factories are saved by their import path, and enum fields get their options from the
+enum class when loaded. Each schema is saved with digests of the source files of the modules that define its models and
+field types, and a schema whose modules have changed since is skipped with a warning, to be compiled when first needed,
+as usual. A file is only read again when its size or modification time has changed, so checking is cheaper than
+compiling. Models changed at runtime without changing their source files are not noticed.
+
+Paths ending with ".msgpack" are written with msgpack, if it is installed, and other paths as compact JSON.
+"""
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import sys
+import warnings
+from functools import lru_cache
+from functools import partial
+from importlib.machinery import EXTENSION_SUFFIXES
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Tuple
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from form import Form
+from form.schema import FieldSpec
+from form.schema import FormSchema
+from form.schema import LIST
+from form.schema import MULTIPLE_CHOICE
+from form.schema import SchemaCache
+from form.schema import _annotations
+from form.schema import unwrap_type
+
+__all__ = ["export_schemas", "load_schemas", "schema_sources"]
+
+FORMAT_VERSION = 2
+
+# Form options that are passed on to the schema compiler, the control mapping options are handled separately
+_COMPILE_OPTIONS = ("control_kwargs", "field_validation_default_error_message", "threshold_for_dropdown", "max_depth")
+_MAPPING_OPTIONS = ("control_mapping", "toggle_for_bool")
+_EXTENSION_SUFFIXES = tuple(EXTENSION_SUFFIXES)
+_FORM_DEFAULTS = {name: parameter.default for name, parameter in inspect.signature(Form.__init__).parameters.items()}
+
+
+def export_schemas(path: str, models: Iterable[Any], **form_options) -> List[FormSchema]:
+    """Compile the schemas for `models` with the form options, and save them to `path`."""
+    mapping, compile_options = _options(form_options)
+    schemas = [FormSchema.compile(model, mapping, **compile_options) for model in models]
+    data = {
+        "format": FORMAT_VERSION,
+        "compiler": _source_digest("form.schema", {}),
+        "mapping": _mapping_fingerprint(mapping),
+        "options": _encode(compile_options),
+        "schemas": [_encode_schema(schema, mapping) for schema in schemas],
+    }
+    _write(Path(path), data)
+    return schemas
+
+
+def load_schemas(path: str, cache: SchemaCache = None, **form_options) -> int:
+    """
+    Add the up-to-date schemas saved in `path` to the cache, `Form.schema_cache` by default, and return how many were
+    added. The form options have to be the ones the schemas were exported with.
+    """
+    cache = Form.schema_cache if cache is None else cache
+    mapping, compile_options = _options(form_options)
+    data = _read(Path(path))
+    # Digests of the source files by module, each file is read once per load
+    digests = {}
+
+    if (
+        data.get("format") != FORMAT_VERSION
+        or data.get("compiler") != _source_digest("form.schema", digests)
+        or data.get("mapping") != _mapping_fingerprint(mapping)
+        or data.get("options") != _encode(compile_options)
+    ):
+        warnings.warn(f"Schemas in {path} were compiled with other form options or version, ignoring them")
+        return 0
+
+    decoder = _Decoder(mapping)
+    loaded = 0
+    for entry in data["schemas"]:
+        try:
+            current = {module: _source_digest(module, digests) for module in entry["sources"]}
+        except ImportError as error:
+            warnings.warn(f"Could not load the precompiled schema for {entry.get('model')}: {error}")
+            continue
+        if current != entry["sources"]:
+            warnings.warn(f"Precompiled schema for {entry['model']} is out of date, it will be compiled when needed")
+            continue
+        try:
+            schema = decoder.schema(entry, compile_options)
+        except (ImportError, AttributeError, KeyError, ValueError) as error:
+            warnings.warn(f"Could not load the precompiled schema for {entry.get('model')}: {error}")
+            continue
+        cache.add(schema, mapping)
+        loaded += 1
+    return loaded
+
+
+def schema_sources(schema: FormSchema) -> Dict[str, str]:
+    """
+    Digests of the source files of the modules that define the models of the schema, their base classes and the types
+    of the fields, by module name.
+    """
+    types = {schema.model}
+    for field in schema.fields_by_path.values():
+        types.add(field.model)
+        if isinstance(field.attribute_type, type):
+            types.add(field.attribute_type)
+    modules = {
+        cls.__module__
+        for model in types if model is not None
+        for cls in model.__mro__
+        if cls.__module__ != "builtins"
+    }
+    digests = {}
+    return {module: _source_digest(module, digests) for module in sorted(modules)}
+
+
+def _options(form_options: dict) -> Tuple[dict, dict]:
+    unknown = set(form_options) - set(_COMPILE_OPTIONS) - set(_MAPPING_OPTIONS)
+    if unknown:
+        raise TypeError(f"Options that do not affect the schema: {', '.join(sorted(unknown))}")
+
+    mapping = Form.control_mapping_for(
+        form_options.get("control_mapping"), form_options.get("toggle_for_bool", _FORM_DEFAULTS["toggle_for_bool"])
+    )
+    compile_options = {name: form_options.get(name, _FORM_DEFAULTS[name]) for name in _COMPILE_OPTIONS}
+    # Form uses an empty dict for no control kwargs, and so the cache key has to
+    compile_options["control_kwargs"] = compile_options["control_kwargs"] or {}
+    return mapping, compile_options
+
+
+# Encoding
+
+def _encode_schema(schema: FormSchema, mapping: dict) -> dict:
+    return {
+        "model": _reference(schema.model),
+        "sources": schema_sources(schema),
+        "fields": [_encode_field(field, mapping) for field in schema.fields],
+    }
+
+
+def _encode_field(field: FieldSpec, mapping: dict) -> dict:
+    entry = {
+        "attribute": field.attribute,
+        "kind": field.kind,
+        "type": _encode_type(field),
+        "control": _encode_control(field.control_type, mapping),
+        "label": field.label_text,
+        "error_message": field.error_message,
+    }
+    # Leave out what most fields do not have, to keep the file compact and quick to load
+    if field.placeholder:
+        entry["placeholder"] = field.placeholder
+    if field.kwargs:
+        entry["kwargs"] = _encode(field.kwargs)
+    if field.dependents:
+        entry["dependents"] = [list(path) for path in field.dependents]
+    if field.validators:
+        entry["validators"] = _encode(field.validators)
+    if field.option_provider:
+        entry["option_provider"] = _encode(field.option_provider)
+    if field.list_style:
+        entry["list_style"] = field.list_style
+    if field.children:
+        entry["children"] = [_encode_field(child, mapping) for child in field.children]
+    return entry
+
+
+def _encode_type(field: FieldSpec) -> Any:
+    if field.pydantic_field is not None and field.attribute_type is field.pydantic_field.type_:
+        # Also covers the constrained types that pydantic creates on the fly
+        return {"$field": True}
+    try:
+        return _encode(field.attribute_type)
+    except ValueError:
+        # Like generic aliases, which are read from the model annotations again
+        return {"$annotation": True}
+
+
+def _encode_control(control_type: Any, mapping: dict) -> Any:
+    # Factories from the mapping, like partials, are saved by key, to get the very same object back
+    for key, value in mapping.items():
+        if value is control_type:
+            return {"$mapping": _encode(key)}
+    return _encode(control_type)
+
+
+def _encode(value: Any) -> Any:
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    if isinstance(value, dict):
+        if not all(isinstance(key, str) for key in value):
+            raise ValueError(f"Only string keys can be saved: {value!r}")
+        return {key: _encode(item) for key, item in value.items()}
+    if isinstance(value, partial):
+        return {"$partial": _reference(value.func), "args": _encode(value.args), "kwargs": _encode(value.keywords)}
+    return {"$ref": _reference(value)}
+
+
+def _reference(value: Any) -> str:
+    """Import path of a class or function, which has to lead back to the same object."""
+    try:
+        name = _name(value)
+    except AttributeError:
+        raise ValueError(f"{value!r} has no import path")
+    try:
+        found = _import(name)
+    except (ImportError, AttributeError):
+        found = None
+    if found is not value:
+        raise ValueError(f"{value!r} cannot be imported as {name}")
+    return name
+
+
+# Decoding
+
+class _Decoder:
+    """Decodes the schemas of one file, importing each name and reading the annotations of each model once."""
+
+    def __init__(self, mapping: dict):
+        self.mapping = mapping
+        self._imported = {}
+        self._annotations = {}
+
+    def schema(self, entry: dict, compile_options: dict) -> FormSchema:
+        model = self.imported(entry["model"])
+        fields_by_path = {}
+        fields = self.fields(entry["fields"], model, tuple(), fields_by_path)
+        return FormSchema(
+            model=model,
+            fields=fields,
+            fields_by_path=fields_by_path,
+            has_async_validators=any(
+                inspect.iscoroutinefunction(validator)
+                for field in fields_by_path.values()
+                for validator in field.validators
+            ),
+            compile_options=dict(compile_options),
+        )
+
+    def fields(self, entries: list, model: Any, path: tuple, fields_by_path: dict) -> List[FieldSpec]:
+        pydantic_fields = getattr(model, "__fields__", None) or {}
+        fields = []
+        for entry in entries:
+            attribute = entry["attribute"]
+            field = FieldSpec(
+                attribute=attribute,
+                path=path + (attribute,),
+                model=model,
+                attribute_type=None,
+                kind=entry["kind"],
+                control_type=self.control(entry["control"]),
+                label_text=entry["label"],
+                placeholder=entry.get("placeholder", ""),
+                error_message=entry["error_message"],
+                kwargs=self.decode(entry["kwargs"]) if "kwargs" in entry else {},
+                pydantic_field=pydantic_fields.get(attribute),
+                dependents=[tuple(dependent) for dependent in entry.get("dependents", ())],
+                validators=self.decode(entry.get("validators", [])),
+                option_provider=self.decode(entry.get("option_provider")),
+                list_style=entry.get("list_style"),
+            )
+            field.attribute_type = self.type(entry["type"], field)
+            children = entry.get("children")
+            field.children = self.fields(children, field.attribute_type, field.path, fields_by_path) if children else []
+            # Same order as the compiler, children first
+            fields_by_path[field.path] = field
+            fields.append(field)
+        return fields
+
+    def type(self, value: Any, field: FieldSpec) -> Any:
+        if type(value) is dict:
+            if "$ref" in value:
+                return self.imported(value["$ref"])
+            if "$field" in value:
+                if field.pydantic_field is None:
+                    raise ValueError(f"{_name(field.model)} has no pydantic field {field.attribute}")
+                return field.pydantic_field.type_
+            if "$annotation" in value:
+                attribute_type = unwrap_type(self.annotations(field.model)[field.attribute])
+                if field.kind in (LIST, MULTIPLE_CHOICE):
+                    attribute_type = attribute_type.__args__[0]
+                return attribute_type
+        return self.decode(value)
+
+    def control(self, value: Any) -> Any:
+        if type(value) is dict and "$mapping" in value:
+            return self.mapping[self.decode(value["$mapping"])]
+        return self.decode(value)
+
+    def decode(self, value: Any) -> Any:
+        if not value or isinstance(value, str):
+            return value
+        if isinstance(value, list):
+            return [self.decode(item) for item in value]
+        if isinstance(value, dict):
+            if "$ref" in value:
+                return self.imported(value["$ref"])
+            if "$partial" in value:
+                return partial(self.imported(value["$partial"]), *self.decode(value["args"]),
+                               **self.decode(value["kwargs"]))
+            return {key: self.decode(item) for key, item in value.items()}
+        return value
+
+    def imported(self, name: str) -> Any:
+        try:
+            return self._imported[name]
+        except KeyError:
+            value = self._imported[name] = _import(name)
+            return value
+
+    def annotations(self, model: Any) -> dict:
+        try:
+            return self._annotations[model]
+        except KeyError:
+            annotations = self._annotations[model] = _annotations(model)
+            return annotations
+
+
+def _import(name: str) -> Any:
+    module_name, _, qualified_name = name.partition(":")
+    value = importlib.import_module(module_name)
+    for attribute in qualified_name.split("."):
+        value = getattr(value, attribute)
+    return value
+
+
+# Fingerprints
+
+def _source_digest(module_name: str, digests: dict) -> str:
+    """Digest of the source file of the module, None for modules without one, like the built-in ones."""
+    try:
+        return digests[module_name]
+    except KeyError:
+        pass
+    module = sys.modules.get(module_name) or importlib.import_module(module_name)
+    path = getattr(module, "__file__", None)
+    digest = digests[module_name] = _file_digest(path) if path else None
+    return digest
+
+
+# Digests of source files by path, with the size and modification time of the file when it was read
+_file_digests = {}
+
+
+def _file_digest(path: str) -> str:
+    stat = os.stat(path)
+    version = (stat.st_size, stat.st_mtime_ns)
+    if path.endswith(_EXTENSION_SUFFIXES):
+        # Compiled modules, like the ones of pydantic, are large and only change when installed again
+        return "{}:{}".format(*version)
+    known = _file_digests.get(path)
+    if known and known[0] == version:
+        return known[1]
+    with open(path, "rb") as source:
+        digest = hashlib.sha256(source.read()).hexdigest()[:16]
+    _file_digests[path] = version, digest
+    return digest
+
+
+def _mapping_fingerprint(mapping: dict) -> str:
+    try:
+        items = frozenset(mapping.items())
+    except TypeError:
+        # Unhashable factory, like a list of controls
+        return _items_fingerprint.__wrapped__(mapping.items())
+    return _items_fingerprint(items)
+
+
+@lru_cache(maxsize=64)
+def _items_fingerprint(items: Iterable[tuple]) -> str:
+    return _hash(sorted([_stable(key), _stable(value)] for key, value in items))
+
+
+def _stable(value: Any) -> Any:
+    """JSON-compatible description of a value that is the same in every process."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, dict):
+        return sorted([_stable(key), _stable(item)] for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return [_stable(item) for item in value]
+    if isinstance(value, partial):
+        return {"partial": _stable(value.func), "args": _stable(value.args), "kwargs": _stable(value.keywords)}
+    if isinstance(value, type) or inspect.isroutine(value):
+        return _name(value)
+    # Not stable if the repr includes the address, which only makes the schema look out of date
+    return repr(value)
+
+
+def _name(value: Any) -> str:
+    return f"{value.__module__}:{value.__qualname__}"
+
+
+def _hash(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=repr).encode()).hexdigest()[:16]
+
+
+# Files
+
+def _write(path: Path, data: dict):
+    if path.suffix == ".msgpack":
+        if msgpack is None:
+            raise ImportError("Writing .msgpack schema files needs msgpack, install it or use a .json file")
+        path.write_bytes(msgpack.packb(data))
+    else:
+        path.write_text(json.dumps(data, separators=(",", ":")))
+
+
+def _read(path: Path) -> dict:
+    if path.suffix == ".msgpack":
+        if msgpack is None:
+            raise ImportError("Reading .msgpack schema files needs msgpack")
+        return msgpack.unpackb(path.read_bytes())
+    return json.loads(path.read_bytes())
@@ -0,0 +1,125 @@
+"""
+Per-field state of a form.
+
+A form keeps one `FieldState` record for each field it has built controls for. The records are stored in a
+`FieldRegistry`, a list with a slot for every field of the schema. Paths are turned into slot numbers with the
+`slots` of the schema, which every form for the same model and options shares. The paths kept in the records are the
+schema's own path tuples, so equal paths are the same object in every form. The form itself needs no per-field dicts.
+"""
+from collections.abc import Mapping
+from typing import Any
+from typing import Iterator
+
+from form.schema import FieldSpec
+from form.schema import FormSchema
+
+__all__ = ["FieldRegistry", "FieldState"]
+
+
+class FieldState:
+    """Controls and validation state of one field of a form."""
+
+    __slots__ = ("path", "field", "control", "message", "tracked", "dirty", "valid")
+
+    def __init__(self, field: FieldSpec, control: Any, message: Any = None):
+        self.path = field.path
+        # Spec from the schema, with the pydantic field that validates the value and the custom validators
+        self.field = field
+        self.control = control
+        # Error message shown below the control, None for fields that have none
+        self.message = message
+        # False if changes to the control cannot be seen, and the field is always validated
+        self.tracked = True
+        # Changed since last validated
+        self.dirty = False
+        # Result of the last validation, None if not validated or no longer valid
+        self.valid = None
+
+    def __repr__(self):
+        return f"FieldState({self.path!r}, {type(self.control).__name__}, dirty={self.dirty}, valid={self.valid})"
+
+
+class FieldRegistry:
+    """Field states of a form, in the slots of the schema, iterated in schema order."""
+
+    __slots__ = ("_slots", "_states", "_count")
+
+    def __init__(self, schema: FormSchema):
+        self._slots = schema.slots
+        self._states = [None] * len(self._slots)
+        self._count = 0
+
+    def add(self, field: FieldSpec, control: Any, message: Any = None) -> FieldState:
+        slot = self._slots[field.path]
+        if self._states[slot] is None:
+            self._count += 1
+        state = self._states[slot] = FieldState(field, control, message)
+        return state
+
+    def get(self, path: tuple, default: Any = None) -> FieldState:
+        slot = self._slots.get(path)
+        state = None if slot is None else self._states[slot]
+        return default if state is None else state
+
+    def __getitem__(self, path: tuple) -> FieldState:
+        state = self.get(path)
+        if state is None:
+            raise KeyError(path)
+        return state
+
+    def __contains__(self, path: tuple) -> bool:
+        return self.get(path) is not None
+
+    def __iter__(self) -> Iterator[FieldState]:
+        return (state for state in self._states if state is not None)
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def controls(self) -> Mapping:
+        """Read-only mapping from paths to controls."""
+        return _ControlsView(self)
+
+    @property
+    def messages(self) -> Mapping:
+        """Read-only mapping from paths to error messages, for the fields that have them."""
+        return _MessagesView(self)
+
+
+class _ControlsView(Mapping):
+
+    __slots__ = ("_registry",)
+
+    def __init__(self, registry: FieldRegistry):
+        self._registry = registry
+
+    def __getitem__(self, path: tuple) -> Any:
+        return self._registry[path].control
+
+    def __iter__(self) -> Iterator[tuple]:
+        return (state.path for state in self._registry)
+
+    def __len__(self) -> int:
+        return len(self._registry)
+
+
+class _MessagesView(_ControlsView):
+
+    __slots__ = ()
+
+    def __getitem__(self, path: tuple) -> Any:
+        message = self._registry[path].message
+        if message is None:
+            raise KeyError(path)
+        return message
+
+    def __contains__(self, path: tuple) -> bool:
+        state = self._registry.get(path)
+        return state is not None and state.message is not None
+
+    def __iter__(self) -> Iterator[tuple]:
+        return (state.path for state in self._registry if state.message is not None)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
@@ -0,0 +1,68 @@
+"""
+Shared scheduler for deferred form work.
+
+Event handlers run on pglet's handler threads and should return promptly instead of sleeping while waiting for
+something to happen later. All forms in the process share one `Scheduler` that runs an asyncio event loop in a
+daemon thread, started on first use.
+"""
+import asyncio
+import threading
+from typing import Callable
+
+__all__ = ["Scheduler", "ScheduledCall", "default_scheduler"]
+
+
+class ScheduledCall:
+    """Handle for a call scheduled with `Scheduler.call_later`."""
+
+    def __init__(self, scheduler: "Scheduler", callback: Callable, args: tuple, pass_call: bool = False):
+        self.scheduler = scheduler
+        self.callback = callback
+        self.args = args
+        self.pass_call = pass_call
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def _run(self):
+        if not self.cancelled:
+            # Callbacks typically update pglet pages, which blocks waiting for the server, so keep them off the loop
+            self.scheduler.loop.run_in_executor(None, self._call)
+
+    def _call(self):
+        if not self.cancelled:
+            self.callback(*self.args, self) if self.pass_call else self.callback(*self.args)
+
+
+class Scheduler:
+
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="form-scheduler", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def call_later(self, delay: float, callback: Callable, *args, pass_call: bool = False) -> ScheduledCall:
+        """
+        Call `callback` with `args` in a worker thread after `delay` seconds, unless cancelled before that.
+        Safe to call from any thread.
+
+        A call can be cancelled just after it has started, so with `pass_call` the `ScheduledCall` is passed to
+        `callback` after the `args`, for the callback to check that it is still the call that is waited for.
+        """
+        call = ScheduledCall(self, callback, args, pass_call)
+        loop = self.loop
+        loop.call_soon_threadsafe(loop.call_later, delay, call._run)
+        return call
+
+
+default_scheduler = Scheduler()
@@ -0,0 +1,467 @@
+"""
+Compiled form schemas.
+
+Walking the annotations of a data model, resolving the control types and applying the dataclass and pydantic field
+overrides gives the same result every time a form is created for the same model with the same options.
+`FormSchema` captures that result once, and `Form` then only needs to bind values to the precompiled plan.
+"""
+import asyncio
+import dataclasses
+import enum
+import inspect
+import threading
+import typing
+from collections import OrderedDict
+from dataclasses import is_dataclass
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Union
+
+from pglet import ChoiceGroup
+from pglet import ComboBox
+from pglet import Dropdown
+from pglet import Textbox
+
+__all__ = ["ControlMapping", "FieldSpec", "FormSchema", "SchemaCache", "schema_cache"]
+
+BASIC = "basic"
+CHOICE = "choice"
+MULTIPLE_CHOICE = "multiple_choice"
+LIST = "list"
+COMPLEX = "complex"
+# Nested model beyond the depth limit, shown but not edited
+TRUNCATED = "truncated"
+# Choice from the options of an option provider
+PROVIDED_CHOICE = "provided_choice"
+
+
+@dataclasses.dataclass
+class FieldSpec:
+    """Everything needed to create the controls for one field, without the value."""
+    attribute: str
+    path: tuple
+    model: Any
+    attribute_type: Any
+    kind: str
+    control_type: Any
+    label_text: str
+    placeholder: str
+    error_message: str
+    kwargs: dict
+    pydantic_field: Any = None
+    children: List["FieldSpec"] = dataclasses.field(default_factory=list)
+    # Paths of the fields whose validators see the value of this field
+    dependents: List[tuple] = dataclasses.field(default_factory=list)
+    # Custom validators from the field options, called with (value, values), sync or async
+    validators: List[Any] = dataclasses.field(default_factory=list)
+    option_provider: Any = None
+    # "rows" or "grid" for lists of models, None for the form default
+    list_style: str = None
+
+
+@dataclasses.dataclass
+class FormSchema:
+    model: Any
+    fields: List[FieldSpec]
+    fields_by_path: Dict[tuple, FieldSpec]
+    has_async_validators: bool = False
+    # Options the schema was compiled with, other than the control mapping
+    compile_options: dict = dataclasses.field(default_factory=dict)
+    # Index of each path in fields_by_path, for the field registries of forms
+    slots: Dict[tuple, int] = dataclasses.field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.slots = {path: index for index, path in enumerate(self.fields_by_path)}
+
+    @classmethod
+    def compile(
+        cls,
+        model: Any,
+        data_to_control_mapping: dict,
+        control_kwargs: dict = None,
+        field_validation_default_error_message: str = "",
+        threshold_for_dropdown: int = 3,
+        max_depth: int = 10,
+    ) -> "FormSchema":
+        """
+        Compile the schema for `model`. Nested models deeper than `max_depth` levels are not expanded into fields,
+        which keeps self-referential models finite.
+        """
+        compiler = _SchemaCompiler(
+            data_to_control_mapping,
+            control_kwargs or {},
+            field_validation_default_error_message,
+            threshold_for_dropdown,
+            max_depth,
+        )
+        fields = compiler.compile_fields(model, tuple())
+        return cls(
+            model=model,
+            fields=fields,
+            fields_by_path=compiler.fields_by_path,
+            has_async_validators=any(
+                asyncio.iscoroutinefunction(validator)
+                for field in compiler.fields_by_path.values()
+                for validator in field.validators
+            ),
+            compile_options=dict(
+                control_kwargs=control_kwargs or {},
+                field_validation_default_error_message=field_validation_default_error_message,
+                threshold_for_dropdown=threshold_for_dropdown,
+                max_depth=max_depth,
+            ),
+        )
+
+    def descendants(self, path: tuple) -> List[FieldSpec]:
+        """All fields nested under the field at `path`, depth first."""
+        result = []
+        for field in self.fields_by_path[path].children:
+            result.append(field)
+            result.extend(self.descendants(field.path))
+        return result
+
+
+class SchemaCache:
+    """
+    Thread-safe LRU cache of compiled schemas, keyed by model and the options that affect compilation.
+    """
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._schemas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._schemas)
+
+    def get(self, model: Any, data_to_control_mapping: dict, control_kwargs: dict = None, **options) -> FormSchema:
+        """Return the cached schema, or compile it. `options` are the `FormSchema.compile` options."""
+        try:
+            key = self._key(model, data_to_control_mapping, control_kwargs, options)
+        except TypeError:
+            # Options that cannot be hashed cannot be cached either
+            return FormSchema.compile(model, data_to_control_mapping, control_kwargs, **options)
+
+        with self._lock:
+            schema = self._schemas.get(key)
+            if schema is not None:
+                self._schemas.move_to_end(key)
+                self.hits += 1
+                return schema
+            self.misses += 1
+
+        schema = FormSchema.compile(model, data_to_control_mapping, control_kwargs, **options)
+
+        self._store(key, schema)
+        return schema
+
+    def add(self, schema: FormSchema, data_to_control_mapping: dict):
+        """
+        Add a schema compiled elsewhere, like one loaded from a precompiled schema file, under the key that `get` uses
+        for the same model, mapping and options.
+        """
+        options = dict(schema.compile_options)
+        control_kwargs = options.pop("control_kwargs", None)
+        self._store(self._key(schema.model, data_to_control_mapping, control_kwargs, options), schema)
+
+    def _store(self, key: tuple, schema: FormSchema):
+        with self._lock:
+            self._schemas[key] = schema
+            self._schemas.move_to_end(key)
+            while len(self._schemas) > self.maxsize:
+                self._schemas.popitem(last=False)
+
+    @staticmethod
+    def _key(model: Any, data_to_control_mapping: dict, control_kwargs: dict, options: dict) -> tuple:
+        key = (model, _freeze(data_to_control_mapping), _freeze(control_kwargs or {}), _freeze(options))
+        hash(key)
+        return key
+
+    def clear(self):
+        with self._lock:
+            self._schemas.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+schema_cache = SchemaCache()
+
+
+def is_complex_type(object_type: Any) -> bool:
+    return is_dataclass(object_type) or hasattr(object_type, "__fields__")
+
+
+class ControlMapping(dict):
+    """
+    Mapping from types to control factories. Keys are type names, like the ones in `Form.data_to_control_mapping`, or
+    type objects.
+
+    Remembers the factory resolved for each type object, and forgets them all whenever the mapping is changed. The
+    resolutions are shared by mappings with the same contents, like the copies of the default mapping that every form
+    makes.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._resolved = None
+
+    def resolve(self, attribute_type: Any) -> Any:
+        if self._resolved is None:
+            self._resolved = _shared_resolutions(self)
+        try:
+            return self._resolved[attribute_type]
+        except KeyError:
+            control_type = self._resolved[attribute_type] = _resolve(attribute_type, self)
+            return control_type
+        except TypeError:
+            # Unhashable type annotation
+            return _resolve(attribute_type, self)
+
+    def copy(self) -> "ControlMapping":
+        return ControlMapping(self)
+
+    def _changed(self):
+        # The resolutions may be shared with other mappings, so leave them as they are
+        self._resolved = None
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._changed()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._changed()
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._changed()
+
+    def setdefault(self, key, default=None):
+        value = super().setdefault(key, default)
+        self._changed()
+        return value
+
+    def pop(self, *args):
+        value = super().pop(*args)
+        self._changed()
+        return value
+
+    def popitem(self):
+        item = super().popitem()
+        self._changed()
+        return item
+
+    def clear(self):
+        super().clear()
+        self._changed()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+
+# Resolutions by the contents of the mapping, for a limited number of different mappings
+_resolutions_by_mapping = {}
+_max_shared_mappings = 64
+
+
+def _shared_resolutions(mapping: ControlMapping) -> dict:
+    try:
+        key = frozenset(mapping.items())
+    except TypeError:
+        # Unhashable factory, like a list of controls
+        return {}
+    resolutions = _resolutions_by_mapping.get(key)
+    if resolutions is None:
+        resolutions = {}
+        if len(_resolutions_by_mapping) < _max_shared_mappings:
+            resolutions = _resolutions_by_mapping.setdefault(key, resolutions)
+    return resolutions
+
+
+def resolve_control_type(attribute_type: Any, data_to_control_mapping: dict) -> Any:
+    """
+    Control factory for the type from the mapping. Looks for the type and then its base classes, by the type object
+    and by name, after unwrapping `Optional`, `Annotated` and `Literal` annotations. Defaults to a `Textbox`.
+    """
+    if isinstance(data_to_control_mapping, ControlMapping):
+        return data_to_control_mapping.resolve(attribute_type)
+    return _resolve(attribute_type, data_to_control_mapping)
+
+
+def _resolve(attribute_type: Any, data_to_control_mapping: dict) -> Any:
+    attribute_type = unwrap_type(attribute_type)
+    for candidate in getattr(attribute_type, "__mro__", (attribute_type,)):
+        for key in (candidate, getattr(candidate, "__name__", None)):
+            try:
+                control_type = data_to_control_mapping.get(key)
+            except TypeError:
+                continue
+            if control_type is not None:
+                return control_type
+    return Textbox
+
+
+def unwrap_type(attribute_type: Any) -> Any:
+    """
+    The type that decides the control: the annotated type of `Annotated`, the first type other than None of a `Union`
+    or `Optional`, and the type of the first value of a `Literal`.
+    """
+    while True:
+        origin = getattr(attribute_type, "__origin__", None)
+        if hasattr(attribute_type, "__metadata__"):
+            attribute_type = origin
+        elif origin is Union:
+            arguments = [argument for argument in attribute_type.__args__ if argument is not type(None)]
+            attribute_type = arguments[0] if arguments else type(None)
+        elif origin is not None and getattr(origin, "_name", None) == "Literal":
+            attribute_type = type(attribute_type.__args__[0])
+        else:
+            return attribute_type
+
+
+class _SchemaCompiler:
+
+    def __init__(self, data_to_control_mapping, control_kwargs, field_validation_default_error_message,
+                 threshold_for_dropdown, max_depth):
+        self.data_to_control_mapping = data_to_control_mapping
+        self.control_kwargs = control_kwargs
+        self.field_validation_default_error_message = field_validation_default_error_message
+        self.threshold_for_dropdown = threshold_for_dropdown
+        self.max_depth = max_depth
+        self.fields_by_path = {}
+
+    def compile_fields(self, model: Any, path: tuple) -> List[FieldSpec]:
+        fields = [
+            self.compile_field(model, attribute, attribute_type, path)
+            for attribute, attribute_type in _annotations(model).items()
+        ]
+
+        # Pydantic validators that take `values` see all the fields defined before them
+        for index, field in enumerate(fields):
+            if _validator_uses_values(field.pydantic_field):
+                for previous_field in fields[:index]:
+                    previous_field.dependents.append(field.path)
+
+        return fields
+
+    def compile_field(self, model: Any, attribute: str, attribute_type: Any, path: tuple) -> FieldSpec:
+
+        # For unions, we consider only the first type annotation that is not None
+        attribute_type = unwrap_type(attribute_type)
+        origin = getattr(attribute_type, "__origin__", None)
+
+        field = FieldSpec(
+            attribute=attribute,
+            path=path + (attribute,),
+            model=model,
+            attribute_type=attribute_type,
+            kind=BASIC,
+            control_type=None,
+            label_text=attribute.replace("_", " ").capitalize(),
+            placeholder="",
+            error_message=self.field_validation_default_error_message,
+            kwargs=dict(self.control_kwargs.get(attribute, {})),
+        )
+
+        self._apply_dataclass_overrides(field)
+        self._apply_pydantic_overrides(field)
+        self._extract_field_options(field)
+
+        if origin == list and len(attribute_type.__args__) == 1:
+            field.attribute_type = attribute_type.__args__[0]
+            if _is_enum(field.attribute_type):
+                field.kind = MULTIPLE_CHOICE
+                field.control_type = ComboBox
+            else:
+                field.kind = LIST
+                if not is_complex_type(field.attribute_type):
+                    field.control_type = resolve_control_type(field.attribute_type, self.data_to_control_mapping)
+        elif _is_enum(attribute_type):
+            field.kind = CHOICE
+            field.control_type = Dropdown if len(attribute_type) >= self.threshold_for_dropdown else ChoiceGroup
+        elif field.option_provider:
+            field.kind = PROVIDED_CHOICE
+        elif is_complex_type(attribute_type) and len(field.path) > self.max_depth:
+            field.kind = TRUNCATED
+        elif is_complex_type(attribute_type):
+            field.kind = COMPLEX
+            field.children = self.compile_fields(attribute_type, field.path)
+        else:
+            field.control_type = resolve_control_type(attribute_type, self.data_to_control_mapping)
+
+        self.fields_by_path[field.path] = field
+
+        return field
+
+    @staticmethod
+    def _extract_field_options(field: FieldSpec):
+        # Options for the form itself, not passed on to the control
+        validators = field.kwargs.pop("validators", None) or []
+        field.validators = list(validators) if isinstance(validators, (list, tuple)) else [validators]
+        field.option_provider = field.kwargs.pop("option_provider", None)
+        field.list_style = field.kwargs.pop("list_style", None)
+
+    @staticmethod
+    def _apply_dataclass_overrides(field: FieldSpec):
+        dataclass_fields = getattr(field.model, "__dataclass_fields__", None)
+        dataclass_field = dataclass_fields and dataclass_fields.get(field.attribute)
+        if dataclass_field and dataclass_field.metadata:
+            field.kwargs.update(dataclass_field.metadata.get("pglet", {}))
+
+    @staticmethod
+    def _apply_pydantic_overrides(field: FieldSpec):
+        pydantic_fields = getattr(field.model, "__fields__", None)
+        pydantic_field = pydantic_fields and pydantic_fields.get(field.attribute)
+        if not pydantic_field:
+            return
+
+        field.pydantic_field = pydantic_field
+
+        label_text = pydantic_field.field_info.title
+        if label_text:
+            field.label_text = label_text
+
+        placeholder = pydantic_field.field_info.description
+        if placeholder:
+            field.placeholder = placeholder
+            field.error_message = placeholder
+
+        extra = pydantic_field.field_info.extra
+        if extra:
+            field.kwargs.update(extra.get("pglet", {}))
+
+
+def _annotations(model: Any) -> dict:
+    # Resolve string annotations, which self-referential models need, when the names can be found
+    try:
+        hints = typing.get_type_hints(model)
+    except Exception:
+        return model.__annotations__
+    return {attribute: hints.get(attribute, annotation) for attribute, annotation in model.__annotations__.items()}
+
+
+def _is_enum(attribute_type: Any) -> bool:
+    return isinstance(attribute_type, enum.EnumMeta)
+
+
+def _validator_uses_values(pydantic_field: Any) -> bool:
+    for validator in getattr(pydantic_field, "class_validators", {}).values():
+        parameters = inspect.signature(validator.func).parameters
+        if "values" in parameters or any(
+            parameter.kind == inspect.Parameter.VAR_KEYWORD for parameter in parameters.values()
+        ):
+            return True
+    return False
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        # Keys can be both type names and types, which do not compare
+        return tuple(sorted(((key, _freeze(item)) for key, item in value.items()), key=lambda item: repr(item[0])))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(item) for item in value)
+    return value
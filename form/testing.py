@@ -0,0 +1,193 @@
+"""
+Headless pglet page for tests and measurements.
+
+`RecordingPage` is a real pglet `Page` whose `RecordingConnection` answers the protocol commands locally instead of
+sending them to a pglet server. The connection counts the updates, commands and controls that the page sends,
+estimates their size on the wire, and keeps its own copy of the control tree as the browser would see it, so that
+the tree can be compared as a JSON snapshot.
+
+    page = RecordingPage()
+    page.add(form)
+    with page.recording() as recording:
+        form._submit(None)
+    assert recording.updates <= 1
+"""
+import dataclasses
+import itertools
+import json
+import threading
+from contextlib import contextmanager
+from typing import List
+
+from pglet import Page
+from pglet.protocol import Actions
+from pglet.protocol import Command
+from pglet.protocol import Message
+from pglet.protocol import PageCommandResponsePayload
+from pglet.protocol import PageCommandsBatchRequestPayload
+from pglet.protocol import PageCommandsBatchResponsePayload
+
+__all__ = ["Recording", "RecordingConnection", "RecordingPage"]
+
+# Message ids are 32 hex digits, the size matters for the byte estimate
+_MESSAGE_ID = "0" * 32
+
+
+@dataclasses.dataclass
+class Recording:
+    """What a page sent to pglet while the recording was active."""
+    updates: int = 0
+    batches: int = 0
+    commands: int = 0
+    controls_added: int = 0
+    controls_changed: int = 0
+    controls_removed: int = 0
+    bytes: int = 0
+
+
+class RecordingConnection:
+    """
+    Stands in for a pglet `Connection`. Answers the commands of a page like the pglet server does, and records them.
+    """
+
+    def __init__(self, page_name: str = "recording"):
+        self.page_name = page_name
+        self.total = Recording()
+        self.recordings = [self.total]
+        self._ids = itertools.count(1)
+        self._nodes = {"page": {"type": "page", "attrs": {}, "controls": []}}
+        self._lock = threading.Lock()
+
+    def send_commands(self, page_name: str, session_id: str, commands: List[Command]):
+        with self._lock:
+            size = self._message_size(
+                Actions.PAGE_COMMANDS_BATCH_FROM_HOST, PageCommandsBatchRequestPayload(page_name, session_id, commands)
+            )
+            results = [self._apply(command) for command in commands]
+            for recording in self.recordings:
+                recording.batches += 1
+                recording.bytes += size
+            return PageCommandsBatchResponsePayload([result for result in results if result is not None], "")
+
+    def send_command(self, page_name: str, session_id: str, command: Command):
+        results = self.send_commands(page_name, session_id, [command]).results
+        return PageCommandResponsePayload(results[0] if results else "", "")
+
+    def count_update(self):
+        with self._lock:
+            for recording in self.recordings:
+                recording.updates += 1
+
+    @contextmanager
+    def recording(self):
+        recording = Recording()
+        with self._lock:
+            self.recordings.append(recording)
+        try:
+            yield recording
+        finally:
+            with self._lock:
+                self.recordings.remove(recording)
+
+    def snapshot(self, uid: str = "page") -> dict:
+        """Control tree under `uid` as the browser would see it."""
+        node = self._nodes[uid]
+        return {
+            "type": node["type"],
+            "attrs": dict(node["attrs"]),
+            "controls": [self.snapshot(child) for child in node["controls"]],
+        }
+
+    def _apply(self, command: Command):
+        """Apply a command to the tree, and return the result line of the command, if any."""
+        if command.name == "get":
+            return ""
+        for recording in self.recordings:
+            recording.commands += 1
+
+        if command.name == "add":
+            ids = self._add(command.attrs["to"], int(command.attrs.get("at", -1)), command.commands)
+            for recording in self.recordings:
+                recording.controls_added += len(ids)
+            return " ".join(ids)
+        elif command.name == "set":
+            self._node(command.values[0])["attrs"].update(command.attrs)
+            for recording in self.recordings:
+                recording.controls_changed += 1
+        elif command.name == "remove":
+            for uid in command.values:
+                self._remove(uid)
+            for recording in self.recordings:
+                recording.controls_removed += len(command.values)
+        elif command.name == "clean":
+            for uid in list(self._node(command.values[0])["controls"]):
+                self._remove(uid)
+        return None
+
+    def _add(self, parent_uid: str, at: int, commands: List[Command]) -> List[str]:
+        ids = []
+        parents = [(-1, parent_uid)]
+        for command in commands:
+            uid = f"_{next(self._ids)}"
+            ids.append(uid)
+            self._nodes[uid] = {"type": command.values[0], "attrs": dict(command.attrs), "controls": []}
+            while parents[-1][0] >= command.indent:
+                parents.pop()
+            siblings = self._node(parents[-1][1])["controls"]
+            if len(parents) == 1 and 0 <= at < len(siblings):
+                siblings.insert(at, uid)
+            else:
+                siblings.append(uid)
+            parents.append((command.indent, uid))
+        return ids
+
+    def _node(self, uid: str) -> dict:
+        # Tests often update controls that were never added to the page, the updates end up in a detached node
+        return self._nodes.get(uid) or {"type": None, "attrs": {}, "controls": []}
+
+    def _remove(self, uid: str):
+        for node in self._nodes.values():
+            if uid in node["controls"]:
+                node["controls"].remove(uid)
+                break
+        self._remove_node(uid)
+
+    def _remove_node(self, uid: str):
+        for child in self._node(uid)["controls"]:
+            self._remove_node(child)
+        self._nodes.pop(uid, None)
+
+    @staticmethod
+    def _message_size(action: str, payload) -> int:
+        return len(json.dumps(Message(_MESSAGE_ID, action, payload), default=vars).encode())
+
+
+class RecordingPage(Page):
+    """Page that needs no pglet server. See the module docstring."""
+
+    def __init__(self, connection: RecordingConnection = None, session_id: str = "recording"):
+        super().__init__(connection or RecordingConnection(), session_id)
+
+    @property
+    def connection(self) -> RecordingConnection:
+        return self._conn
+
+    @property
+    def updates(self) -> int:
+        """Number of times `update` has been called."""
+        return self._conn.total.updates
+
+    def update(self, *controls):
+        self._conn.count_update()
+        return super().update(*controls)
+
+    def recording(self):
+        """Context manager that yields a `Recording` of what the page sends within the block."""
+        return self._conn.recording()
+
+    def snapshot(self) -> dict:
+        """Control tree of the page as the browser would see it."""
+        return self._conn.snapshot()
+
+    def snapshot_json(self, indent: int = 2) -> str:
+        return json.dumps(self.snapshot(), indent=indent, sort_keys=True)
@@ -0,0 +1,95 @@
+"""
+Copy-on-write working copy of a form value.
+
+Instead of deep-copying the whole value when a form is opened, the form edits a `WorkingCopy` that records the
+changed values by attribute path and reads everything else through to the original value. On submit, only the
+changed paths are committed to the original.
+"""
+import copy
+from typing import Any
+
+__all__ = ["WorkingCopy", "shallow_copy"]
+
+
+class WorkingCopy:
+
+    def __init__(self, original: Any, write_through: bool = False):
+        """
+        With `write_through`, changes are written to the original value immediately (the Form autosave option).
+        """
+        self.original = original
+        self.write_through = write_through
+        self.changes = {}
+
+    def get(self, path: tuple) -> Any:
+        if path in self.changes:
+            return self.changes[path]
+
+        obj = self.original
+        remaining = path
+        for end in range(len(path) - 1, 0, -1):
+            if path[:end] in self.changes:
+                obj = self.changes[path[:end]]
+                remaining = path[end:]
+                break
+
+        for attribute_name in remaining:
+            obj = getattr(obj, attribute_name)
+        return obj
+
+    def set(self, path: tuple, value: Any):
+        if self.write_through:
+            setattr(self.get(path[:-1]), path[-1], value)
+        else:
+            self.changes[path] = value
+
+    def values(self, path: tuple = tuple()) -> dict:
+        """Attribute values of the object at `path`, with changes applied."""
+        values = dict(self.get(path).__dict__)
+        for changed_path, value in self.changes.items():
+            if changed_path[:-1] == path:
+                values[changed_path[-1]] = value
+        return values
+
+    def as_dict(self) -> dict:
+        """
+        Whole value as a dict with changes applied. Nested objects are converted to dicts only where they contain
+        changes.
+        """
+        values = dict(self.original.__dict__)
+        for path, value in self._changes_by_depth():
+            target = values
+            for attribute_name in path[:-1]:
+                nested = target[attribute_name]
+                if type(nested) is not dict:
+                    nested = target[attribute_name] = dict(nested.__dict__)
+                target = nested
+            target[path[-1]] = value
+        return values
+
+    def commit(self):
+        """
+        Write the changes to the original value. Nested objects along the changed paths are replaced with changed
+        shallow copies, so that objects shared with other values are not modified.
+        """
+        copies = {tuple(): self.original}
+        for path, value in self._changes_by_depth():
+            setattr(self._writable(path[:-1], copies), path[-1], value)
+        self.changes.clear()
+
+    def _writable(self, path: tuple, copies: dict) -> Any:
+        if path not in copies:
+            parent = self._writable(path[:-1], copies)
+            copies[path] = shallow_copy(getattr(parent, path[-1]))
+            setattr(parent, path[-1], copies[path])
+        return copies[path]
+
+    def _changes_by_depth(self) -> list:
+        return sorted(self.changes.items(), key=lambda item: len(item[0]))
+
+
+def shallow_copy(value: Any) -> Any:
+    # copy.copy of a pydantic model would share the field values dict with the original
+    if hasattr(value, "__fields__") and callable(getattr(value, "copy", None)):
+        return value.copy()
+    return copy.copy(value)
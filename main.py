@@ -1,5 +1,14 @@
+import ast
+import importlib
 import inspect
+import logging
+import subprocess
+import sys
+import time
+from collections import OrderedDict
+from functools import lru_cache
 from functools import partial
+from pathlib import Path
 from textwrap import dedent
 
 from pglet import app
@@ -8,12 +17,161 @@ from pglet import Stack
 from pglet import Text
 from pglet import Toggle
 
-from manual_content import content
+# Module with the demos, read for the table of contents and page texts without importing it
+CONTENT_MODULE = "manual_content"
+CONTENT_CLASS = "Content"
+
+
+class ManualPage:
+    """
+    One page of the manual. Title and body are prepared once per process from the source of the demo function, and the
+    module with the demo is imported when the demo is first shown.
+    """
+
+    def __init__(self, module: str, qualified_name: str, docstring: str, source: str, display_name: str = None):
+        self.module = module
+        self.qualified_name = qualified_name
+        name = qualified_name.rpartition(".")[2]
+        self.display_name = display_name or name.replace("_", " ").capitalize()
+        self.body = get_body_text(docstring, source)
+
+    @property
+    def demo(self):
+        """The demo function, which returns the control to show next to the text."""
+        value = import_lazily(self.module)
+        for attribute in self.qualified_name.split("."):
+            value = getattr(value, attribute)
+        return value
+
+
+def get_body_text(docstring: str, source: str) -> str:
+    body = docstring
+
+    blocks = source.split('"""')
+    code = "\n".join(blocks[2].splitlines()[:-1])
+    code = dedent(code).strip()
+    code = f"```\n{code}\n```"
+
+    if "[code]" in body:
+        body = body.replace("[code]", code)
+    elif "[no code]" in body:
+        body = body.replace("[no code]", "")
+    else:
+        body = f"{body}\n{code}"
+
+    return body
+
+
+@lru_cache(maxsize=None)
+def manual_pages(module: str = CONTENT_MODULE, class_name: str = CONTENT_CLASS) -> tuple:
+    """Pages for the methods of the content class, in order, shared by all sessions."""
+    path = Path(__file__).with_name(f"{module}.py")
+    lines = path.read_text(encoding="utf-8").splitlines(keepends=True)
+    content_class = next(
+        node for node in ast.parse("".join(lines)).body if isinstance(node, ast.ClassDef) and node.name == class_name
+    )
+
+    display_names = {}
+    for node in content_class.body:
+        # Like: grande_finale.display_name = "Grande Finale"
+        if isinstance(node, ast.Assign):
+            for target in node.targets:
+                if isinstance(target, ast.Attribute) and target.attr == "display_name":
+                    display_names[target.value.id] = ast.literal_eval(node.value)
+
+    return tuple(
+        ManualPage(
+            module,
+            f"{class_name}.{node.name}",
+            ast.get_docstring(node),
+            # Same lines as inspect.getsource would give
+            "".join(inspect.getblock(lines[node.lineno - 1:])),
+            display_names.get(node.name),
+        )
+        for node in content_class.body
+        if isinstance(node, ast.FunctionDef)
+    )
+
+
+def import_lazily(module: str):
+    """Import the module, and log how long it took the first time."""
+    if module in sys.modules:
+        return sys.modules[module]
+    start = time.perf_counter()
+    imported = importlib.import_module(module)
+    logging.info("Imported %s in %.0f ms", module, (time.perf_counter() - start) * 1000)
+    return imported
+
+
+def import_time_report(modules=("main", CONTENT_MODULE), top: int = 10) -> str:
+    """
+    Where the import time of each module goes: the packages it imports that take the most time, including what they
+    import in turn, measured with `python -X importtime` in a fresh interpreter.
+    """
+    report = []
+    for module in modules:
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True,
+            text=True,
+            cwd=Path(__file__).parent,
+        )
+        timings = []
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "[us]" in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            # Nested imports are indented by two more spaces
+            timings.append((int(cumulative), len(name) - len(name.lstrip()), name.strip()))
+
+        # The last line is the module itself, with everything it imports
+        total, indent, _ = timings[-1] if timings else (0, 0, "")
+        report.append(f"{module}: {total / 1000:.0f} ms")
+        direct_imports = []
+        # Its imports are listed right before it, anything less indented was imported by the interpreter startup
+        for cumulative, level, name in reversed(timings[:-1]):
+            if level <= indent:
+                break
+            if level == indent + 2:
+                direct_imports.append((cumulative, name))
+        for cumulative, name in sorted(direct_imports, reverse=True)[:top]:
+            report.append(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    start = time.perf_counter()
+    manual_pages.cache_clear()
+    manual_pages()
+    report.append(f"Page texts for {len(manual_pages())} pages: {(time.perf_counter() - start) * 1000:.0f} ms")
+    return "\n".join(report)
+
+
+def load_test_script():
+    """Steps of a user who fills in and submits the validation demos, for `python main.py --load-test SESSIONS`."""
+    from form.loadtest import click, edit, submit
+
+    return [
+        click(text="Validation"),
+        edit("Jane Doe"),
+        edit("jane@example.com", nth=2),
+        edit(42, kind="spinbutton"),
+        submit(),
+        click(text="Cross-field validation"),
+        edit(True, kind="checkbox"),
+        submit(),
+        click(text="Validation"),
+        edit("not an email", nth=2),
+        submit(),
+    ]
 
 
 class FormDemoApp:
+
+    # Demo controls of the most recently visited pages, shown again as they were left
+    cached_pages = 5
+
     def __init__(self, page):
         self.page = page
+        self.pages = manual_pages()
+        self.page_controls = OrderedDict()
 
         self.table_of_contents = Stack(gap=0, controls=self.get_controls_for_table_of_contents())
         self.previous_button = Button(icon="ChevronUp", on_click=partial(self.navigate, -1))
@@ -93,66 +251,54 @@ class FormDemoApp:
                 controls=[
                     Button(
                         action=True,
-                        text=self.display_name(func),
+                        text=manual_page.display_name,
                         icon="CircleRing",
-                        on_click=partial(self.display_menu_item, func),
+                        on_click=partial(self.display_menu_item, index),
                     )
                 ],
             )
-            for func in content
+            for index, manual_page in enumerate(self.pages)
         ]
 
-    def display_menu_item(self, document_function, event=None):
-        self.selected_index = content.index(document_function)
+    def display_menu_item(self, index, event=None):
+        self.selected_index = index
         self.navigate(0)
 
     def navigate(self, delta, event=None):
-        self.selected_index = max(0, min(len(content) - 1, self.selected_index + delta))
+        self.selected_index = max(0, min(len(self.pages) - 1, self.selected_index + delta))
 
         self.previous_button.disabled = self.selected_index == 0
-        self.next_button.disabled = self.selected_index == (len(content) - 1)
+        self.next_button.disabled = self.selected_index == (len(self.pages) - 1)
 
-        self.display_function(content[self.selected_index])
+        self.display_page(self.pages[self.selected_index])
 
-    def display_function(self, document_function):
+    def display_page(self, manual_page):
         for control in self.table_of_contents.controls:
             control.controls[0].icon = "CircleRing"
 
         self.table_of_contents.controls[self.selected_index].controls[0].icon = "CircleFill"
 
-        document_function = content[self.selected_index]
-        self.title.value = self.display_name(document_function)
-        self.body.value = self.get_body_text(document_function)
-        self.result.clean()
-        control = document_function(None)
-        if control:
-            control.border = "1px solid"
-            self.result.controls = [control]
+        self.title.value = manual_page.display_name
+        self.body.value = manual_page.body
+        control = self.get_page_control(self.selected_index)
+        self.result.controls = [control] if control else []
         self.page.update()
 
-    def get_body_text(self, document_function):
-        body = inspect.getdoc(document_function)
+    def get_page_control(self, index):
+        """Demo control of the page, from the cache if the page was visited recently, otherwise a new one."""
+        if index in self.page_controls:
+            self.page_controls.move_to_end(index)
+            return self.page_controls[index]
 
-        source = inspect.getsource(document_function)
-        blocks = source.split('"""')
-        code = "\n".join(blocks[2].splitlines()[:-1])
-        code = dedent(code).strip()
-        code = f"```\n{code}\n```"
-
-        if "[code]" in body:
-            body = body.replace("[code]", code)
-        elif "[no code]" in body:
-            body = body.replace("[no code]", "")
-        else:
-            body = f"{body}\n{code}"
-
-        return body
-
-    def display_name(self, document_function):
-        base_display_name = document_function.__name__.replace("_", " ").capitalize()
-        explicit_display_name = getattr(document_function, "display_name", None)
+        control = self.pages[index].demo(None)
+        if control:
+            control.border = "1px solid"
 
-        return explicit_display_name or base_display_name
+        self.page_controls[index] = control
+        while len(self.page_controls) > self.cached_pages:
+            # Nothing else refers to the controls of the evicted page once it is no longer shown
+            self.page_controls.popitem(last=False)
+        return control
 
     def set_mode(self, event=None):
         self.page.theme = "dark" if self.mode_toggle.value else "light"
@@ -160,4 +306,14 @@ class FormDemoApp:
 
 
 if __name__ == "__main__":
-    app("index", target=FormDemoApp)
+    if "--import-times" in sys.argv:
+        print(import_time_report())
+    elif "--load-test" in sys.argv:
+        from form.loadtest import run_load_test
+
+        sessions = int(sys.argv[sys.argv.index("--load-test") + 1])
+        print(run_load_test(FormDemoApp, load_test_script(), sessions=sessions).format())
+    else:
+        # Page texts are ready before the first session
+        manual_pages()
+        app("index", target=FormDemoApp)
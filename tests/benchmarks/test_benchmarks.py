@@ -0,0 +1,250 @@
+"""
+Performance benchmarks for building, validating and editing forms, using pytest-benchmark.
+
+The benchmarks also run in the normal test run, where tests/conftest.py disables benchmarking so that each of them
+runs just once. To record a baseline on the CI machine:
+
+    pytest tests/benchmarks --benchmark-enable --benchmark-only --benchmark-autosave
+
+and to fail the run when the mean of any benchmark regresses by more than 25% against the latest saved baseline:
+
+    pytest tests/benchmarks --benchmark-enable --benchmark-only --benchmark-compare --benchmark-compare-fail=mean:25%
+
+Baselines are saved under `.benchmarks/`, per machine, Python implementation and version.
+"""
+import dataclasses
+from typing import List
+
+import pytest
+from pydantic import BaseModel
+from pydantic import Field
+from pydantic import create_model
+
+from form import Form
+from form.precompiled import export_schemas
+from form.precompiled import load_schemas
+from form.schema import FormSchema
+from form.schema import SchemaCache
+
+pytest.importorskip("pytest_benchmark")
+
+
+def dataclass_model(field_count: int, name: str = "Generated"):
+    """Flat dataclass with `field_count` fields of the basic types, cycling through str, int, float and bool."""
+    types = [(str, ""), (int, 0), (float, 0.0), (bool, False)]
+    return dataclasses.make_dataclass(
+        name,
+        [
+            (f"field_{index}", types[index % len(types)][0], dataclasses.field(default=types[index % len(types)][1]))
+            for index in range(field_count)
+        ],
+    )
+
+
+def pydantic_model(field_count: int, name: str = "Generated"):
+    """Flat pydantic model with `field_count` constrained fields, so that validation has something to do."""
+    fields = {}
+    for index in range(field_count):
+        if index % 2:
+            fields[f"field_{index}"] = (int, Field(0, ge=0))
+        else:
+            fields[f"field_{index}"] = (str, Field("", max_length=100))
+    return create_model(name, __base__=BaseModel, **fields)
+
+
+def nested_dataclass_model(depth: int, fields_per_level: int = 3):
+    """Dataclass with `depth` levels of nested dataclasses, each with `fields_per_level` basic fields."""
+    model = dataclass_model(fields_per_level, name="Level0")
+    for level in range(1, depth + 1):
+        nested = model
+        model = dataclasses.make_dataclass(
+            f"Level{level}",
+            [(f"field_{index}", str, dataclasses.field(default="")) for index in range(fields_per_level)]
+            + [("nested", nested, dataclasses.field(default_factory=nested))],
+        )
+    return model
+
+
+@dataclasses.dataclass
+class Item:
+    title: str = ""
+    year: int = 2000
+
+    def __str__(self):
+        return f"{self.title} ({self.year})"
+
+
+def items_model(item_count: int, simple: bool = True):
+    """Dataclass with one list of `item_count` strings or `Item`s."""
+    if simple:
+        default = lambda: [str(index) for index in range(item_count)]  # noqa: E731
+        item_type = str
+    else:
+        default = lambda: [Item(title=str(index), year=index) for index in range(item_count)]  # noqa: E731
+        item_type = Item
+    return dataclasses.make_dataclass(
+        "Items", [("items", List[item_type], dataclasses.field(default_factory=default))]
+    )
+
+
+def list_control(form):
+    return form._fields[("items",)]
+
+
+@pytest.mark.parametrize("field_count", [10, 100, 500])
+def test_build_vs_field_count(benchmark, field_count):
+    model = dataclass_model(field_count)
+    form = benchmark(Form, model)
+    assert len(form._fields) == field_count
+
+
+@pytest.mark.parametrize("field_count", [10, 100, 500])
+def test_schema_compile_vs_field_count(benchmark, field_count):
+    model = pydantic_model(field_count)
+    schema = benchmark(FormSchema.compile, model, Form.default_data_to_control_mapping)
+    assert len(schema.fields) == field_count
+
+
+@pytest.fixture
+def application_models(monkeypatch):
+    """Twenty models of an application, importable from this module as precompiled schemas refer to them."""
+
+    def create(field_count: int) -> list:
+        models = []
+        for index in range(20):
+            model = pydantic_model(field_count, f"Application{field_count}x{index}")
+            model.__module__ = __name__
+            monkeypatch.setitem(globals(), model.__name__, model)
+            models.append(model)
+        return models
+
+    return create
+
+
+@pytest.mark.parametrize("field_count", [10, 100])
+def test_startup_compiling_schemas(benchmark, application_models, field_count):
+    benchmark.group = f"startup with 20 models of {field_count} fields"
+    models = application_models(field_count)
+
+    def compile_all():
+        cache = SchemaCache()
+        for model in models:
+            cache.get(model, Form.default_data_to_control_mapping)
+        return cache
+
+    benchmark(compile_all)
+
+
+@pytest.mark.parametrize("field_count", [10, 100])
+def test_startup_loading_precompiled_schemas(benchmark, application_models, tmp_path, field_count):
+    benchmark.group = f"startup with 20 models of {field_count} fields"
+    path = tmp_path / "schemas.json"
+    export_schemas(path, application_models(field_count))
+
+    assert benchmark(lambda: load_schemas(path, SchemaCache())) == 20
+
+
+@pytest.mark.parametrize("depth", [1, 5, 9])
+def test_build_vs_nesting_depth(benchmark, depth):
+    model = nested_dataclass_model(depth)
+    form = benchmark(Form, model)
+    assert len(form._fields) == 4 * depth + 3
+
+
+@pytest.mark.parametrize("depth", [1, 5, 9])
+def test_collapsed_build_vs_nesting_depth(benchmark, depth):
+    model = nested_dataclass_model(depth)
+    form = benchmark(Form, model, collapse_sections=True)
+    assert len(form._fields) == 4
+
+
+def forget_validation_results(form: Form):
+    for state in form._registry:
+        state.valid = None
+
+
+@pytest.mark.parametrize("field_count", [10, 100, 500])
+def test_submit_vs_field_count(benchmark, page, field_count):
+    form = Form(pydantic_model(field_count))
+    form.page = page
+
+    def submit():
+        # Without changes, submit would only check the validation cache
+        forget_validation_results(form)
+        form._submit(None)
+
+    benchmark(submit)
+    assert form.submit_button.icon == "CheckMark"
+
+
+@pytest.mark.parametrize("field_count", [10, 100, 500])
+def test_bulk_submit_vs_field_count(benchmark, page, field_count):
+    form = Form(pydantic_model(field_count), bulk_validation=True)
+    form.page = page
+
+    def submit():
+        forget_validation_results(form)
+        form._submit(None)
+
+    benchmark(submit)
+    assert form.submit_button.icon == "CheckMark"
+
+
+@pytest.mark.parametrize("simple", [True, False], ids=["simple", "complex"])
+@pytest.mark.parametrize("item_count", [10, 1000, 10000])
+def test_list_add_vs_list_length(benchmark, page, item_count, simple):
+    def setup():
+        control = list_control(Form(items_model(item_count, simple)))
+        control.page = page
+        control.panel_holder.page = page
+        return (control,), {}
+
+    def add(control):
+        control.list_add(None)
+        return control
+
+    control = benchmark.pedantic(add, setup=setup, rounds=20)
+    assert len(control.value) == item_count + 1
+
+
+@pytest.mark.parametrize("simple", [True, False], ids=["simple", "complex"])
+@pytest.mark.parametrize("item_count", [10, 1000, 10000])
+def test_list_delete_vs_list_length(benchmark, page, item_count, simple):
+    def setup():
+        control = list_control(Form(items_model(item_count, simple)))
+        control.page = page
+        return (control,), {}
+
+    def delete(control):
+        control.list_delete(0, None)
+        return control
+
+    control = benchmark.pedantic(delete, setup=setup, rounds=20)
+    assert len(control.value) == item_count - 1
+
+
+@pytest.mark.parametrize("item_count", [10, 1000])
+def test_list_selection_subform_open(benchmark, page, item_count):
+    control = list_control(Form(items_model(item_count, simple=False)))
+    control.page = page
+    control.panel_holder.page = page
+    items = iter(range(10 ** 9))
+
+    def open_subform():
+        control.list_selection(control.value[next(items) % item_count], None)
+
+    benchmark(open_subform)
+    assert control.panel.open
+
+
+@pytest.mark.parametrize("metrics", [False, True], ids=["metrics_off", "metrics_on"])
+def test_submit_metrics_overhead(benchmark, page, metrics):
+    form = Form(pydantic_model(100), metrics=metrics)
+    form.page = page
+
+    def submit():
+        forget_validation_results(form)
+        form._submit(None)
+
+    benchmark(submit)
+    assert (form.metrics is not None) == metrics
@@ -0,0 +1,15 @@
+import pytest
+
+from form.testing import RecordingPage
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    # Benchmarks run once each, as tests, unless enabled with --benchmark-enable
+    if config.pluginmanager.hasplugin("benchmark") and not config.getoption("benchmark_enable"):
+        config.option.benchmark_disable = True
+
+
+@pytest.fixture
+def page():
+    return RecordingPage()
@@ -0,0 +1,692 @@
+import asyncio
+import threading
+import time
+from dataclasses import dataclass
+from dataclasses import field
+from typing import List
+from typing import Optional
+from typing import Union
+
+from pglet import SpinButton
+from pglet import Textbox
+from pydantic import BaseModel
+from pydantic import Field
+from pydantic import conint
+from pydantic import root_validator
+from pydantic import validator
+from pglet.control_event import ControlEvent
+from typing_extensions import Annotated
+from typing_extensions import Literal
+
+from form import Form
+from form.schema import COMPLEX
+from form.schema import ControlMapping
+from form.schema import LIST
+from form.schema import SchemaCache
+from form.schema import TRUNCATED
+from form.schema import resolve_control_type
+from form.scheduler import Scheduler
+
+
+@dataclass
+class Movie:
+    title: str = ""
+    year: int = 2000
+
+
+@dataclass
+class TagsModel:
+    tags: List[str] = field(default_factory=lambda: ["a", "b"])
+
+
+@dataclass
+class DataclassModel:
+    name: str = "Dataclass Person"
+    notes: str = field(default="", metadata={"pglet": {"multiline": True}})
+    age: int = 33
+    favorite_movie: Movie = field(default_factory=Movie)
+    favorite_movies: List[Movie] = field(default_factory=list)
+
+
+class PydanticMovie(BaseModel):
+    title: str = ""
+    year: int = Field(2000, title="Year of release")
+
+
+class PydanticModel(BaseModel):
+    name: str = Field("Pydantic Person", description="Your name")
+    movie: PydanticMovie = PydanticMovie()
+
+
+class ConstrainedModel(BaseModel):
+    age: conint(ge=0) = 0
+
+
+class NestedConstrainedModel(BaseModel):
+    name: str = ""
+    nested: ConstrainedModel = ConstrainedModel()
+    low: int = 0
+    high: int = 1
+
+    @root_validator(skip_on_failure=True)
+    def low_below_high(cls, values):
+        if values["low"] >= values["high"]:
+            raise ValueError("low must be below high")
+        return values
+
+
+class Node(BaseModel):
+    name: str = ""
+    child: Optional["Node"] = None
+
+
+Node.update_forward_refs()
+
+
+class CrossFieldModel(BaseModel):
+    name: str = ""
+    newsletter_ok: bool = False
+    email: str = ""
+    notes: str = ""
+
+    @validator("email", allow_reuse=True)
+    def email_filled_if_needed(cls, value, values):
+        if values.get("newsletter_ok") and not value:
+            raise ValueError("Need email for newsletter")
+        return value
+
+
+async def not_taken(value, values):
+    await asyncio.sleep(0.1)
+    if value == "taken":
+        raise ValueError("already in use")
+    return value.strip()
+
+
+def lowercase(value, values):
+    return value.lower()
+
+
+class UniqueNamesModel(BaseModel):
+    name: str = Field("", pglet={"validators": not_taken})
+    nickname: str = Field("", pglet={"validators": [lowercase, not_taken]})
+    age: conint(ge=0) = 0
+
+
+def change(control, value):
+    control.value = value
+    control.on_change(ControlEvent(None, "change", None, control, None))
+
+
+def count_validations(form):
+    validated = []
+    validate_value = form._validate_value
+
+    def counting_validate_value(attribute):
+        validated.append(attribute)
+        return validate_value(attribute)
+
+    form._validate_value = counting_validate_value
+    return validated
+
+
+def test_schema_is_shared_between_forms():
+    cache = SchemaCache()
+    Form.schema_cache, original_cache = cache, Form.schema_cache
+    try:
+        first = Form(DataclassModel)
+        second = Form(DataclassModel())
+    finally:
+        Form.schema_cache = original_cache
+
+    assert first.schema is second.schema
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_schema_options_are_part_of_the_cache_key():
+    cache = SchemaCache()
+    mapping = Form.default_data_to_control_mapping
+
+    default = cache.get(DataclassModel, mapping)
+    custom = cache.get(DataclassModel, {**mapping, "str": SpinButton})
+
+    assert default is not custom
+    assert custom.fields_by_path[("name",)].control_type is SpinButton
+
+
+def test_schema_cache_evicts_least_recently_used():
+    cache = SchemaCache(maxsize=1)
+    mapping = Form.default_data_to_control_mapping
+
+    movie_schema = cache.get(Movie, mapping)
+    cache.get(DataclassModel, mapping)
+
+    assert len(cache) == 1
+    assert cache.get(Movie, mapping) is not movie_schema
+
+
+def test_schema_resolves_nested_paths_and_overrides():
+    schema = Form(DataclassModel).schema
+
+    assert schema.fields_by_path[("notes",)].kwargs == {"multiline": True}
+    assert schema.fields_by_path[("favorite_movie",)].kind == COMPLEX
+    assert schema.fields_by_path[("favorite_movie", "year")].control_type is SpinButton
+    assert schema.fields_by_path[("favorite_movies",)].kind == LIST
+
+
+def test_schema_applies_nested_pydantic_overrides():
+    form = Form(PydanticModel())
+
+    assert form.schema.fields_by_path[("name",)].placeholder == "Your name"
+    assert form.schema.fields_by_path[("movie", "year")].label_text == "Year of release"
+    assert set(form._fields) == {("name",), ("movie",), ("movie", "title"), ("movie", "year")}
+
+
+def test_submit_sends_a_single_page_update(page):
+    submitted = []
+    form = Form(PydanticModel(), on_submit=submitted.append)
+    form.page = page
+
+    form._submit(None)
+
+    assert page.updates == 1
+    assert form.last_update_batch.requested == 3
+    assert form.last_update_batch.coalesced == 2
+    assert len(submitted) == 1
+
+
+def test_nested_batches_flush_once(page):
+    form = Form(Movie)
+    form.page = page
+
+    with form.batch_updates() as outer:
+        with form.batch_updates() as inner:
+            form._update_page()
+        form._update_page()
+        assert page.updates == 0
+
+    assert inner is outer
+    assert page.updates == 1
+    assert outer.coalesced == 1
+
+
+def test_live_validation_in_another_thread_waits_for_the_open_batch(page):
+    form = Form(ConstrainedModel())
+    form.page = page
+    form._fields[("age",)].value = -1
+    validation = threading.Thread(target=form._live_validate, args=(("age",),))
+
+    with form.batch_updates() as batch:
+        validation.start()
+        validation.join(0.05)
+        assert validation.is_alive()
+    validation.join()
+
+    assert batch.requested == 0
+    assert form.last_update_batch is not batch
+    assert form.last_update_batch.requested == 1
+    assert form._messages[("age",)].visible
+    assert page.updates == 1
+
+
+def test_submit_failure_feedback_does_not_block(page):
+    form = Form(ConstrainedModel())
+    form.page = page
+    form.scheduler = Scheduler()
+    form.submit_feedback_seconds = 0.05
+    form._fields[("age",)].value = -1
+
+    start = time.perf_counter()
+    form._submit(None)
+
+    assert time.perf_counter() - start < 0.05
+    assert form.submit_button.icon == "Cancel"
+    assert form._messages[("age",)].visible
+
+    deadline = time.perf_counter() + 2
+    while form.submit_button.icon != "CheckMark" and time.perf_counter() < deadline:
+        time.sleep(0.01)
+
+    assert form.submit_button.icon == "CheckMark"
+    assert form.submit_button.primary
+
+
+def test_successful_submit_cancels_pending_feedback(page):
+    form = Form(ConstrainedModel())
+    form.page = page
+    form.scheduler = Scheduler()
+    form._fields[("age",)].value = -1
+    form._submit(None)
+    pending = form._submit_feedback
+
+    form._fields[("age",)].value = 1
+    form._submit(None)
+
+    assert pending.cancelled
+    assert form.submit_button.icon == "CheckMark"
+    assert form.value.age == 1
+
+
+def test_stale_feedback_reset_keeps_the_feedback_of_a_newer_failure(page):
+    form = Form(ConstrainedModel())
+    form.page = page
+    form.scheduler = Scheduler()
+    form._fields[("age",)].value = -1
+    form._submit(None)
+    stale = form._submit_feedback
+
+    form._submit(None)
+    # Reset that started just before the second failure cancelled it
+    form._reset_submit_button(stale)
+
+    assert form._submit_feedback is not stale
+    assert form.submit_button.icon == "Cancel"
+
+
+def test_unedited_submit_keeps_nested_objects(page):
+    for value, nested_attribute, bulk_validation in (
+        (DataclassModel(), "favorite_movie", False),
+        (PydanticModel(), "movie", False),
+        (PydanticModel(), "movie", True),
+    ):
+        nested = getattr(value, nested_attribute)
+        form = Form(value, bulk_validation=bulk_validation)
+        form.page = page
+
+        form._submit(None)
+
+        assert getattr(value, nested_attribute) is nested
+
+
+def test_bulk_validation_maps_errors_to_nested_paths(page):
+    form = Form(NestedConstrainedModel(), bulk_validation=True)
+    form.page = page
+    form._fields[("nested", "age")].value = -1
+    form._fields[("name",)].value = "Changed"
+
+    form._submit(None)
+
+    assert form._messages[("nested", "age")].visible
+    assert "greater than or equal to 0" in form._messages[("nested", "age")].value
+    assert not form._messages[("name",)].visible
+    assert form.working_copy.get(("name",)) == "Changed"
+    assert form.value.name == ""
+    assert page.updates == 1
+
+
+def test_bulk_validation_runs_root_validators(page):
+    submitted = []
+    form = Form(NestedConstrainedModel(), bulk_validation=True, on_submit=submitted.append)
+    form.page = page
+    form._fields[("low",)].value = 5
+
+    form._submit(None)
+
+    assert form._form_not_valid_message.visible
+    assert form._form_not_valid_message.value == "Low must be below high"
+    assert not submitted
+
+    form._fields[("high",)].value = 10
+    form._submit(None)
+
+    assert not form._form_not_valid_message.visible
+    assert (form.value.low, form.value.high) == (5, 10)
+    assert len(submitted) == 1
+
+
+def test_change_events_mark_fields_dirty():
+    form = Form(CrossFieldModel())
+
+    change(form._fields[("name",)], "Changed")
+
+    assert form.dirty_paths == {("name",)}
+
+
+def test_submit_revalidates_only_dirty_fields_and_their_dependents(page):
+    form = Form(CrossFieldModel())
+    form.page = page
+    validated = count_validations(form)
+
+    form._submit(None)
+    assert len(validated) == 4
+    validated.clear()
+
+    form._submit(None)
+    assert validated == []
+
+    change(form._fields[("newsletter_ok",)], True)
+    form._submit(None)
+
+    assert validated == [("newsletter_ok",), ("email",)]
+    assert form._messages[("email",)].visible
+    assert form.dirty_paths == set()
+
+
+def test_list_changes_mark_list_dirty():
+    form = Form(TagsModel())
+    list_control = form._fields[("tags",)]
+
+    change(list_control.controls[0].controls[0], "z")
+
+    assert form.dirty_paths == {("tags",)}
+    assert form.working_copy.get(("tags",))[0] == "z"
+
+
+def test_working_copy_commits_only_changed_paths(page):
+    value = PydanticModel()
+    original_movie = value.movie
+    form = Form(value)
+    form.page = page
+
+    change(form._fields[("movie", "title")], "Changed")
+    form._submit(None)
+
+    assert form.working_copy.changes == {}
+    assert value.movie.title == "Changed"
+    assert value.movie is not original_movie
+    assert original_movie.title == ""
+
+
+def test_working_copy_leaves_original_alone_until_submit(page):
+    tags = ["a", "b"]
+    value = TagsModel(tags=tags)
+    form = Form(value)
+    form.page = page
+    list_control = form._fields[("tags",)]
+    list_control.page = page
+
+    list_control.list_delete(0, None)
+
+    assert tags == ["a", "b"]
+    assert form.working_copy.get(("tags",)) == ["b"]
+
+    form._submit(None)
+
+    assert value.tags == ["b"]
+    assert tags == ["a", "b"]
+
+
+def test_autosave_writes_through(page):
+    value = CrossFieldModel()
+    form = Form(value, autosave=True)
+    form.page = page
+
+    change(form._fields[("name",)], "Saved")
+    form._validate_value(("name",))
+
+    assert value.name == "Saved"
+
+
+def test_collapsed_sections_build_controls_on_first_expand(page):
+    form = Form(NestedConstrainedModel(), collapse_sections=True)
+    form.page = page
+    section = form._fields[("nested",)]
+
+    assert ("nested", "age") not in form._fields
+
+    section.toggle(None)
+
+    assert section.expanded
+    assert ("nested", "age") in form._fields
+
+    content = section.content.controls
+    section.toggle(None)
+    section.toggle(None)
+
+    assert section.content.controls is content
+
+
+def test_unexpanded_sections_are_validated_from_values(page):
+    value = NestedConstrainedModel()
+    value.nested.age = -1
+    form = Form(value, collapse_sections=True)
+    form.page = page
+    section = form._fields[("nested",)]
+
+    form._submit(None)
+
+    assert not section.built
+    assert section.message.visible
+    assert section.message.value.startswith("Age: ")
+    assert form.submit_button.icon == "Cancel"
+
+
+def test_unexpanded_sections_are_validated_in_bulk(page):
+    value = NestedConstrainedModel()
+    value.nested.age = -1
+    form = Form(value, collapse_sections=True, bulk_validation=True)
+    form.page = page
+    section = form._fields[("nested",)]
+
+    form._submit(None)
+
+    assert not section.built
+    assert section.message.visible
+    assert section.message.value.startswith("Age: ")
+
+
+def test_self_referential_model_stops_at_depth_limit(page):
+    value = Node(name="a", child=Node(name="b", child=Node(name="c", child=Node(name="d"))))
+    form = Form(value, max_depth=1)
+    form.page = page
+
+    assert form._fields[("child", "name")].value == "b"
+    assert form.schema.fields_by_path[("child", "child")].kind == TRUNCATED
+    assert ("child", "child", "name") not in form._fields
+
+    form._submit(None)
+
+    assert value.child.child.child.name == "d"
+
+
+def test_field_validators_are_not_passed_to_controls():
+    form = Form(UniqueNamesModel())
+
+    assert form.schema.fields_by_path[("nickname",)].validators == [lowercase, not_taken]
+    assert form.schema.fields_by_path[("nickname",)].kwargs == {}
+    assert form.schema.has_async_validators
+    assert form.is_async
+
+
+def test_async_validators_run_concurrently_in_one_update(page):
+    form = Form(UniqueNamesModel())
+    form.page = page
+    form._fields[("name",)].value = " Name "
+    form._fields[("nickname",)].value = "TAKEN"
+
+    start = time.perf_counter()
+    is_valid = asyncio.run(form.submit_async())
+
+    assert time.perf_counter() - start < 0.2
+    assert not is_valid
+    assert form._messages[("nickname",)].visible
+    assert form._messages[("nickname",)].value == "Already in use"
+    assert form._fields[("name",)].value == "Name"
+    assert page.updates == 1
+
+
+def test_async_validators_do_not_run_for_invalid_values(page):
+    called = []
+
+    async def record(value, values):
+        called.append(value)
+        return value
+
+    form = Form(ConstrainedModel(), control_kwargs={"age": {"validators": [record]}})
+    form.page = page
+    form._fields[("age",)].value = -1
+
+    assert not asyncio.run(form.submit_async())
+    assert called == []
+
+
+def test_async_on_submit_is_awaited(page):
+    submitted = []
+
+    async def on_submit(event):
+        await asyncio.sleep(0)
+        submitted.append(event.control.value)
+
+    value = Movie()
+    form = Form(value, on_submit=on_submit)
+    form.page = page
+    form._fields[("title",)].value = "Async"
+
+    form._submit(None)
+
+    assert submitted == [value]
+    assert value.title == "Async"
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.perf_counter() + timeout
+    while not condition() and time.perf_counter() < deadline:
+        time.sleep(0.01)
+
+
+def test_live_validation_coalesces_bursts_of_changes(page):
+    form = Form(ConstrainedModel(), live_validation=True, live_validation_delays={SpinButton: 0.05})
+    form.page = page
+    form.scheduler = Scheduler()
+    validated = count_validations(form)
+    age = form._fields[("age",)]
+
+    for value in (1, 12, -12):
+        change(age, value)
+
+    assert validated == []
+    wait_for(lambda: validated)
+    time.sleep(0.1)
+
+    assert validated == [("age",)]
+    assert form._messages[("age",)].visible
+    assert form.dirty_paths == set()
+
+
+def test_live_validation_coalesces_concurrent_changes(page):
+    form = Form(ConstrainedModel(), live_validation=True, live_validation_delays={SpinButton: 0.3})
+    form.page = page
+    form.scheduler = Scheduler()
+    validated = count_validations(form)
+    age = form._fields[("age",)]
+
+    for burst in range(10):
+        # pglet calls each handler in its own thread
+        threads = [threading.Thread(target=change, args=(age, burst * 8 + i)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    wait_for(lambda: validated)
+    time.sleep(0.4)
+
+    assert validated == [("age",)]
+    assert form._live_validations == {}
+
+
+def test_live_validation_delay_depends_on_control_type():
+    form = Form(Movie, live_validation=True, live_validation_delays={Textbox: 1})
+
+    assert form._live_validation_delay(form._fields[("title",)]) == 1
+    assert form._live_validation_delay(form._fields[("year",)]) == Form.live_validation_delays[SpinButton]
+
+
+def test_submit_cancels_pending_live_validation(page):
+    form = Form(CrossFieldModel(), live_validation=True)
+    form.page = page
+    form.scheduler = Scheduler()
+
+    change(form._fields[("name",)], "Changed")
+    pending = form._live_validations[("name",)]
+    form._submit(None)
+
+    assert pending.cancelled
+    assert form._live_validations == {}
+
+
+class SlowlyValidatedModel(BaseModel):
+    name: str = ""
+
+    @validator("name", allow_reuse=True)
+    def slow(cls, value):
+        time.sleep(0.1)
+        return value
+
+
+def test_change_during_live_validation_is_not_lost_on_submit(page):
+    submitted = []
+    form = Form(
+        SlowlyValidatedModel(),
+        live_validation=True,
+        live_validation_delays={Textbox: 0.01},
+        on_submit=lambda event: submitted.append(event.control.value.name),
+    )
+    form.page = page
+    form.scheduler = Scheduler()
+    name = form._fields[("name",)]
+
+    change(name, "ab")
+    wait_for(lambda: form._running_live_validations)
+    change(name, "abc")
+    assert name.value == "abc"
+    assert ("name",) in form.dirty_paths
+
+    form._submit(None)
+
+    assert name.value == "abc"
+    assert submitted == ["abc"]
+    assert form.dirty_paths == set()
+
+
+class Year(int):
+    pass
+
+
+def test_resolver_walks_the_mro_and_unwraps_annotations():
+    mapping = Form.default_data_to_control_mapping
+
+    assert resolve_control_type(Year, mapping) is SpinButton
+    assert resolve_control_type(Optional[Year], mapping) is SpinButton
+    assert resolve_control_type(Union[None, int], mapping) is SpinButton
+    assert resolve_control_type(Literal["a", "b"], mapping) is Textbox
+    assert resolve_control_type(Annotated[int, "metadata"], mapping) is SpinButton
+    assert resolve_control_type(object, mapping) is Textbox
+
+
+def test_resolver_caches_per_type_until_the_mapping_changes():
+    mapping = ControlMapping({"int": SpinButton})
+
+    assert mapping.resolve(Year) is SpinButton
+    assert mapping._resolved == {Year: SpinButton}
+
+    mapping[Year] = Textbox
+
+    assert mapping._resolved is None
+    assert mapping.resolve(Year) is Textbox
+
+
+def test_identical_mappings_share_resolutions():
+    first = Form.control_mapping_for()
+    second = Form.control_mapping_for()
+
+    assert first.resolve(Year) is SpinButton
+    assert second._resolved is None
+    assert second.resolve(Year) is SpinButton
+    assert second._resolved is first._resolved
+
+    second |= {Year: Textbox}
+
+    assert second.resolve(Year) is Textbox
+    assert first.resolve(Year) is SpinButton
+    third = Form.control_mapping_for(control_mapping={Year: Textbox})
+    third.resolve(Year)
+    assert third._resolved is second._resolved
+
+
+def test_control_mapping_accepts_types():
+    form = Form(Movie, control_mapping={Year: Textbox, int: Textbox})
+
+    assert form.data_to_control_mapping.resolve(int) is Textbox
+    assert Form.default_data_to_control_mapping.resolve(int) is SpinButton
+    assert type(form._fields[("year",)]) is Textbox
@@ -0,0 +1,62 @@
+from dataclasses import dataclass
+from dataclasses import field
+from typing import List
+
+from form import Form
+from form.instrumentation import MetricsCollector
+
+
+@dataclass
+class Movie:
+    title: str = ""
+    year: int = 2000
+    tags: List[str] = field(default_factory=lambda: ["a", "b"])
+
+
+def test_metrics_are_off_by_default():
+    form = Form(Movie)
+
+    assert form.metrics is None
+
+
+def test_phases_and_counters_are_recorded(page):
+    submitted = []
+    form = Form(Movie, metrics=True, on_submit=submitted.append)
+    form.page = page
+
+    form._submit(None)
+
+    metrics = form.metrics
+    for phase in ("working_copy", "schema", "controls", "validate_field", "submit", "commit", "submit_handler",
+                  "page_update"):
+        assert metrics.timing_counts[phase] >= 1, phase
+        assert metrics.timings[phase] >= 0
+    assert metrics.counters["validations"] == 3
+    # Three field controls, and two rows of a text box and a delete button in a stack
+    assert metrics.counters["controls_created"] == 3 + 2 * 3
+
+
+def test_collector_aggregates_forms_in_prometheus_format(page):
+    collector = MetricsCollector()
+    Form.metrics_sink, original_sink = collector, Form.metrics_sink
+    try:
+        for _ in range(2):
+            form = Form(Movie)
+            form.page = page
+            form._submit(None)
+    finally:
+        Form.metrics_sink = original_sink
+
+    text = collector.prometheus_text()
+
+    assert '# TYPE pglet_form_phase_seconds summary' in text
+    assert 'pglet_form_phase_seconds_count{model="Movie",phase="schema"} 2' in text
+    assert 'pglet_form_validations_total{model="Movie"} 6' in text
+    assert text.endswith("\n")
+
+
+def test_collector_escapes_label_values():
+    collector = MetricsCollector()
+    collector.increment('Odd "model"\\', "validations")
+
+    assert 'pglet_form_validations_total{model="Odd \\"model\\"\\\\"} 1' in collector.prometheus_text()
@@ -0,0 +1,547 @@
+import enum
+from dataclasses import dataclass
+from dataclasses import field
+from types import SimpleNamespace
+from typing import List
+from typing import Optional
+
+from pglet import SpinButton
+from pglet import Textbox
+from pydantic import BaseModel
+from pydantic import Field
+from pydantic import conint
+from pydantic import validator
+
+from form import Form
+from form import GridListControl
+
+
+@dataclass
+class Movie:
+    title: str = ""
+    year: int = 2000
+
+    def __str__(self):
+        return f"{self.title} ({self.year})"
+
+
+class Color(enum.Enum):
+    GREEN = "green"
+    RED = "red"
+
+
+@dataclass
+class Car:
+    model: str = ""
+    color: Color = Color.GREEN
+
+
+@dataclass
+class Cars:
+    cars: List[Car] = field(default_factory=list)
+
+
+@dataclass
+class Tags:
+    tags: List[str] = field(default_factory=list)
+
+
+@dataclass
+class Movies:
+    movies: List[Movie] = field(default_factory=list)
+
+
+def list_control(form, attribute):
+    return form._fields[(attribute,)]
+
+
+def row_values(control):
+    return [row.controls[0].value for row in control.controls if row is not control.paging_controls]
+
+
+def test_long_list_renders_only_one_page():
+    form = Form(Tags(tags=[str(i) for i in range(5000)]), list_page_size=50)
+    control = list_control(form, "tags")
+
+    assert len(control.controls) == 51
+    assert control.controls[-1] is control.paging_controls
+    assert row_values(control)[:2] == ["0", "1"]
+    assert control.page_info.value == "1-50 / 5000"
+    assert control.previous_page_button.disabled
+
+
+def test_paging_moves_the_window(page):
+    form = Form(Tags(tags=[str(i) for i in range(120)]), list_page_size=50)
+    control = list_control(form, "tags")
+    control.page = page
+
+    control.list_next_page(None)
+    assert row_values(control)[0] == "50"
+
+    control.list_next_page(None)
+    assert row_values(control) == [str(i) for i in range(100, 120)]
+    assert control.next_page_button.disabled
+
+    control.list_previous_page(None)
+    assert control.page_info.value == "51-100 / 120"
+
+
+def test_short_list_has_no_paging_controls():
+    form = Form(Tags(tags=["a", "b"]), list_page_size=50)
+    control = list_control(form, "tags")
+
+    assert control.paging_controls not in control.controls
+    assert row_values(control) == ["a", "b"]
+
+
+def test_deleting_the_last_item_on_a_page_moves_back(page):
+    form = Form(Tags(tags=[str(i) for i in range(3)]), list_page_size=2)
+    control = list_control(form, "tags")
+    control.page = page
+    control.list_next_page(None)
+
+    control.list_delete(2, None)
+
+    assert control.offset == 0
+    assert row_values(control) == ["0", "1"]
+
+
+def test_complex_list_rows_are_windowed():
+    form = Form(Movies(movies=[Movie(title=str(i)) for i in range(1000)]), list_page_size=20)
+    control = list_control(form, "movies")
+
+    rows = [row for row in control.controls if row not in (control.paging_controls, control.panel_holder)]
+    assert len(rows) == 20
+    assert rows[0].controls[0].text == "0 (2000)"
+
+
+def test_delete_creates_only_the_row_sliding_into_view(page):
+    form = Form(Tags(tags=[str(i) for i in range(5000)]), list_page_size=50)
+    control = list_control(form, "tags")
+    control.page = page
+    second_row = control.controls[1]
+    created = control.controls_created
+
+    control._handle_delete_event(control._keys[0], None)
+
+    assert control.controls_created - created == 3
+    assert control.controls[0] is second_row
+    assert row_values(control)[-1] == "50"
+
+
+def test_delete_on_unpaged_list_creates_no_controls(page):
+    form = Form(Tags(tags=["a", "b", "c"]))
+    control = list_control(form, "tags")
+    control.page = page
+    created = control.controls_created
+
+    control.list_delete(1, None)
+
+    assert control.controls_created == created
+    assert row_values(control) == ["a", "c"]
+
+
+def test_move_reorders_existing_rows(page):
+    form = Form(Tags(tags=["a", "b", "c"]))
+    control = list_control(form, "tags")
+    control.page = page
+    first_row, _, third_row = control.controls
+    created = control.controls_created
+
+    control.list_move(0, 2)
+
+    assert control.controls_created == created
+    assert control.controls[2] is first_row
+    assert control.controls[1] is third_row
+    assert form.working_copy.get(("tags",)) == ["b", "c", "a"]
+
+
+def test_row_callbacks_follow_their_item_after_changes(page):
+    form = Form(Tags(tags=["a", "b", "c"]))
+    control = list_control(form, "tags")
+    control.page = page
+    last_row = control.controls[2]
+
+    control.list_delete(0, None)
+    last_row.controls[1].on_click(None)
+
+    assert form.working_copy.get(("tags",)) == ["b"]
+
+
+def test_editing_a_complex_item_patches_its_row(page):
+    form = Form(Movies(movies=[Movie(title="a"), Movie(title="b")]))
+    control = list_control(form, "movies")
+    control.page = page
+    control.panel_holder.page = page
+    row = control.controls[1]
+    created = control.controls_created
+
+    row.controls[0].on_click(None)
+    subform = control.panel_holder.controls[-1].controls[0]
+    subform.page = page
+    subform._fields[("title",)].value = "c"
+    subform._submit(None)
+
+    assert control.controls_created == created
+    assert control.controls[1] is row
+    assert row.controls[0].text == "c (2000)"
+
+
+def test_subform_is_reused_for_every_item(page):
+    form = Form(Movies(movies=[Movie(title=str(i), year=2000 + i) for i in range(500)]))
+    control = list_control(form, "movies")
+    control.panel_holder.page = page
+
+    control.list_selection(control.value[0], None)
+    subform = control.panel.controls[0]
+    title_control = subform._fields[("title",)]
+
+    control.list_selection(control.value[499], None)
+
+    assert control.panel.controls[0] is subform
+    assert subform._fields[("title",)] is title_control
+    assert title_control.value == "499"
+    assert subform._fields[("year",)].value == 2499
+    assert control.panel.open
+
+
+def test_rebind_resets_validation_state(page):
+    form = Form(Movies(movies=[Movie(title="a"), Movie(title="b")]))
+    control = list_control(form, "movies")
+    control.panel_holder.page = page
+    control.list_selection(control.value[0], None)
+    subform = control.panel.controls[0]
+    subform._messages[("title",)].visible = True
+    subform._mark_dirty(("title",))
+
+    subform.rebind(control.value[1])
+
+    assert not subform._messages[("title",)].visible
+    assert subform.dirty_paths == set()
+    assert subform._fields[("title",)].value == "b"
+
+
+@dataclass
+class Address:
+    street: str = ""
+
+
+@dataclass
+class Person:
+    name: str = ""
+    address: Optional[Address] = None
+
+
+@dataclass
+class People:
+    people: List[Person] = field(default_factory=list)
+
+
+def test_subform_is_rebuilt_when_nested_values_are_set_differently(page):
+    form = Form(People(people=[
+        Person(name="a", address=Address(street="Main")),
+        Person(name="b"),
+        Person(name="c", address=Address(street="Side")),
+    ]))
+    control = list_control(form, "people")
+    control.panel_holder.page = page
+
+    control.list_selection(control.value[0], None)
+    with_address = control.panel.controls[0]
+    control.list_selection(control.value[1], None)
+    without_address = control.panel.controls[0]
+    control.list_selection(control.value[2], None)
+
+    assert without_address is not with_address
+    assert without_address._fields[("address",)].value == "None"
+    assert ("address", "street") not in without_address._fields
+    assert control.panel.controls[0]._fields[("address", "street")].value == "Side"
+
+
+@dataclass
+class Deep:
+    inner: Address = field(default_factory=Address)
+
+
+def test_rebind_refreshes_truncated_values():
+    form = Form(Deep(inner=Address(street="Main")), max_depth=0)
+
+    form.rebind(Deep(inner=Address(street="Side")))
+
+    assert form._fields[("inner",)].value == str(Address(street="Side"))
+
+
+def test_dismissing_the_panel_keeps_it_for_reuse(page):
+    form = Form(Movies(movies=[Movie(title="a")]))
+    control = list_control(form, "movies")
+    control.panel_holder.page = page
+    control.list_selection(control.value[0], None)
+    panel = control.panel
+
+    control._handle_subform_dismiss_event(None)
+    control.list_selection(control.value[0], None)
+
+    assert control.panel is panel
+    assert control.panel_holder.controls == [panel]
+    assert panel.open
+
+
+def test_item_edits_reach_the_value_only_on_submit(page):
+    first = Movie(title="a")
+    value = Movies(movies=[first])
+    form = Form(value)
+    form.page = page
+    control = list_control(form, "movies")
+    control.page = page
+    control.panel_holder.page = page
+
+    control.controls[0].controls[0].on_click(None)
+    subform = control.panel.controls[0]
+    subform.page = page
+    subform._fields[("title",)].value = "b"
+    subform._submit(None)
+
+    assert first.title == "a"
+    assert control.value[0].title == "b"
+
+    form._submit(None)
+
+    assert value.movies[0].title == "b"
+    assert first.title == "a"
+
+
+def test_edits_after_submit_copy_the_list_again(page):
+    value = Tags(tags=["a", "b", "c"])
+    form = Form(value)
+    form.page = page
+    control = list_control(form, "tags")
+    control.page = page
+
+    control.list_delete(0, None)
+    form._submit(None)
+    committed = value.tags
+    control.list_delete(0, None)
+
+    assert value.tags == committed == ["b", "c"]
+
+    form._submit(None)
+
+    assert value.tags == ["c"]
+    assert committed == ["b", "c"]
+
+
+def test_adding_to_a_simple_list_adds_an_empty_row(page):
+    form = Form(Tags(tags=["a"]))
+    control = list_control(form, "tags")
+    control.page = page
+
+    control.list_add(None)
+
+    assert row_values(control) == ["a", ""]
+    assert not control._subforms
+
+
+class PydanticTags(BaseModel):
+    tags: List[str] = []
+
+
+def test_validating_a_list_keeps_its_rows(page):
+    form = Form(PydanticTags(tags=[str(index) for index in range(30)]))
+    page.add(form)
+    control = list_control(form, "tags")
+    rows = list(control.controls)
+    created = control.controls_created
+
+    control.controls[3].controls[0].value = "changed"
+    control._handle_change_event(control._keys[3], SimpleNamespace(control=control.controls[3].controls[0]))
+    with page.recording() as recording:
+        form._submit(None)
+
+    assert control.controls == rows
+    assert control.controls_created == created
+    assert recording.controls_added == recording.controls_removed == 0
+    assert row_values(control)[3] == "changed"
+
+
+class PydanticMovie(BaseModel):
+    title: str = ""
+    year: conint(ge=1900) = 2000
+
+
+class PydanticMovies(BaseModel):
+    movies: List[PydanticMovie] = Field(default_factory=list, pglet={"list_style": "grid"})
+
+
+def grid_rows(control):
+    return [row for row in control.controls if row not in (control.header, control.paste_area, control.paging_controls)]
+
+
+def test_grid_columns_come_from_the_item_model():
+    form = Form(Movies(movies=[Movie(title="a", year=1999)]), list_style="grid")
+    control = list_control(form, "movies")
+
+    assert type(control) is GridListControl
+    assert [column.attribute for column in control.columns] == ["title", "year"]
+    assert [cell.value for cell in control._cells[control._keys[0]].values()] == ["a", 1999]
+    assert type(control._cells[control._keys[0]]["year"]) is SpinButton
+
+
+def test_grid_cells_edit_a_copy_of_the_item(page):
+    first = Movie(title="a")
+    value = Movies(movies=[first])
+    form = Form(value, list_style="grid")
+    form.page = page
+    control = list_control(form, "movies")
+    control.page = page
+
+    title = control._cells[control._keys[0]]["title"]
+    title.value = "b"
+    title.on_change(None)
+
+    assert first.title == "a"
+    assert form.dirty_paths == {("movies",)}
+
+    form._submit(None)
+
+    assert value.movies[0].title == "b"
+    assert first.title == "a"
+
+
+def edit_cell(control, index, attribute, value):
+    cell = control._cells[control._keys[index]][attribute]
+    cell.value = value
+    cell.on_change(None)
+
+
+def test_grid_edits_after_submit_copy_the_item_again(page):
+    value = Movies(movies=[Movie(title="a")])
+    form = Form(value, list_style="grid")
+    form.page = page
+    control = list_control(form, "movies")
+    control.page = page
+
+    edit_cell(control, 0, "title", "b")
+    form._submit(None)
+    committed = value.movies[0]
+    edit_cell(control, 0, "title", "c")
+
+    assert value.movies[0].title == committed.title == "b"
+
+    form._submit(None)
+
+    assert value.movies[0].title == "c"
+    assert committed.title == "b"
+
+
+def test_grid_rows_are_validated_and_block_submit(page):
+    form = Form(PydanticMovies(movies=[PydanticMovie(title="a")]))
+    form.page = page
+    control = list_control(form, "movies")
+    control.page = page
+    key = control._keys[0]
+
+    year = control._cells[key]["year"]
+    year.value = 1800
+    year.on_change(None)
+
+    assert control._row_messages[key].visible
+    assert control._row_messages[key].value.startswith("Year: ensure this value is greater than or equal to 1900")
+
+    form._submit(None)
+    assert form._messages[("movies",)].value == "Check row 1"
+    assert form.submit_button.icon == "Cancel"
+
+    year.value = 1950
+    year.on_change(None)
+    form._submit(None)
+    assert form.value.movies[0].year == 1950
+
+
+class ShoutedName(BaseModel):
+    name: str = ""
+
+    @validator("name", allow_reuse=True)
+    def shout(cls, value):
+        return value.strip().upper()
+
+
+class ShoutedNames(BaseModel):
+    names: List[ShoutedName] = Field(default_factory=list, pglet={"list_style": "grid"})
+
+
+def test_grid_cell_edits_show_the_validated_value(page):
+    form = Form(ShoutedNames(names=[ShoutedName(name="ALICE")]))
+    page.add(form)
+    control = list_control(form, "names")
+    cell = control._cells[control._keys[0]]["name"]
+
+    with page.recording() as recording:
+        edit_cell(control, 0, "name", "  bob ")
+
+    assert cell.value == "BOB"
+    assert recording.controls_changed >= 1
+    assert page.snapshot_json().count('"BOB"') == 1
+
+
+def test_grid_renders_only_visible_rows():
+    form = Form(Movies(movies=[Movie(title=str(i)) for i in range(1000)]), list_style="grid", list_page_size=20)
+    control = list_control(form, "movies")
+
+    assert len(grid_rows(control)) == 20
+    assert len(control._cells) == 20
+
+
+def test_pasted_rows_are_added_and_validated(page):
+    form = Form(PydanticMovies())
+    form.page = page
+    control = list_control(form, "movies")
+    control.page = page
+
+    added = control.paste_rows("Alien\t1979\nBrazil\t1985\n\nMetropolis\t1800\n")
+
+    assert added == 3
+    assert [(movie.title, movie.year) for movie in control.value[:2]] == [("Alien", 1979), ("Brazil", 1985)]
+    assert list(control.row_errors) == [control._keys[2]]
+    assert len(grid_rows(control)) == 3
+
+
+def test_pasted_choices_are_parsed_and_unknown_ones_are_row_errors(page):
+    value = Cars()
+    form = Form(value, list_style="grid")
+    form.page = page
+    control = list_control(form, "cars")
+    control.page = page
+
+    assert control.paste_rows("a\tgreen\nb\tpurple") == 2
+
+    assert control.value[0].color is Color.GREEN
+    assert control.row_errors == {control._keys[1]: "Color: value is not a valid choice"}
+    assert type(control._cells[control._keys[1]]["color"]) is Textbox
+
+    form._submit(None)
+    assert value.cars == []
+
+    edit_cell(control, 1, "color", "Red")
+    form._submit(None)
+
+    assert not control.row_errors
+    assert [car.color for car in value.cars] == [Color.GREEN, Color.RED]
+
+
+def test_pasted_text_in_number_columns_blocks_submit_of_dataclass_items(page):
+    value = Movies()
+    form = Form(value, list_style="grid")
+    form.page = page
+    control = list_control(form, "movies")
+    control.page = page
+
+    control.paste_rows("Alien\tnineteen")
+
+    assert control.row_errors == {control._keys[0]: "Year: value is not a valid number"}
+    form._submit(None)
+    assert value.movies == []
+
+    edit_cell(control, 0, "year", "1979")
+    form._submit(None)
+
+    assert value.movies == [Movie(title="Alien", year=1979)]
@@ -0,0 +1,87 @@
+import json
+
+from pglet import Button
+from pglet import Stack
+from pglet import Text
+from pydantic import BaseModel
+from pydantic import conint
+
+from form import Form
+from form.loadtest import Step
+from form.loadtest import click
+from form.loadtest import edit
+from form.loadtest import main
+from form.loadtest import run_load_test
+from form.loadtest import submit
+
+
+class Order(BaseModel):
+    customer: str = ""
+    quantity: conint(ge=1) = 1
+
+
+class OrderApp:
+    """Minimal app with a counter button and an order form, like a pglet app target."""
+
+    def __init__(self, page):
+        self.submitted = []
+        self.clicks = Text(value="0")
+        self.form = Form(Order, on_submit=lambda event: self.submitted.append(event.control.value))
+        page.add(Stack(controls=[Button(text="Count", on_click=self.count), self.clicks, self.form]))
+
+    def count(self, event):
+        self.clicks.value = str(int(self.clicks.value) + 1)
+        event.page.update()
+
+
+apps = []
+
+
+def order_app(page):
+    apps.append(OrderApp(page))
+    return apps[-1]
+
+
+def test_sessions_replay_the_script_independently():
+    apps.clear()
+    script = [click(text="Count"), edit("Jane"), edit(3, kind="spinbutton"), submit()]
+
+    report = run_load_test(order_app, script, sessions=4, repeat=2)
+
+    assert len(report.sessions) == 4
+    for app in apps:
+        assert app.clicks.value == "2"
+        assert [(order.customer, order.quantity) for order in app.submitted] == [("Jane", 3)] * 2
+    for session in report.sessions:
+        assert session.events == 8
+        assert len(session.handler_seconds) == 8
+        assert session.errors == []
+        assert session.updates >= 4
+        assert session.memory > 0
+    assert 0 < report.percentile(50) <= report.percentile(99)
+    assert report.updates_per_second > 0
+
+
+def test_failing_steps_are_reported_per_session():
+    report = run_load_test(order_app, [click(text="Missing"), edit(0, kind="spinbutton"), submit()], sessions=2,
+                           trace_memory=False)
+
+    for session in report.sessions:
+        assert len(session.errors) == 1
+        assert session.errors[0].startswith("click button: LookupError")
+        assert session.memory is None
+    text = report.format()
+    assert "Sessions: 2, events: 4, errors: 2" in text
+    assert "Error: click button: LookupError" in text
+
+
+def test_command_line_reads_the_script_from_json(tmp_path, capsys):
+    path = tmp_path / "script.json"
+    path.write_text(json.dumps([{"action": "click", "text": "Count"}, {"action": "submit"}]))
+
+    main(["test_loadtest:order_app", "--script", str(path), "--sessions", "2", "--no-memory"])
+
+    assert "Sessions: 2, events: 4, errors: 0" in capsys.readouterr().out
+    assert Step.from_dict({"action": "edit", "kind": "textbox", "value": "x", "label": "Name"}) == Step(
+        "edit", "textbox", {"label": "Name"}, value="x"
+    )
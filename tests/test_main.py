@@ -0,0 +1,83 @@
+import inspect
+import subprocess
+import sys
+from pathlib import Path
+from textwrap import dedent
+
+import main
+from main import manual_pages
+
+ROOT = Path(main.__file__).parent
+
+
+def inspected_body_text(document_function):
+    """Body text as the manual built it from the imported demo functions before the pages were precomputed."""
+    body = inspect.getdoc(document_function)
+
+    source = inspect.getsource(document_function)
+    blocks = source.split('"""')
+    code = "\n".join(blocks[2].splitlines()[:-1])
+    code = dedent(code).strip()
+    code = f"```\n{code}\n```"
+
+    if "[code]" in body:
+        body = body.replace("[code]", code)
+    elif "[no code]" in body:
+        body = body.replace("[no code]", "")
+    else:
+        body = f"{body}\n{code}"
+
+    return body
+
+
+def inspected_display_name(document_function):
+    base_display_name = document_function.__name__.replace("_", " ").capitalize()
+    return getattr(document_function, "display_name", None) or base_display_name
+
+
+def test_manual_pages_are_read_without_importing_the_demos():
+    script = "import sys, main; main.manual_pages(); print('manual_content' in sys.modules)"
+
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, cwd=ROOT, check=True)
+
+    assert result.stdout.strip() == "False"
+
+
+def test_manual_pages_match_the_inspected_demo_functions():
+    from manual_content import content
+
+    pages = manual_pages()
+
+    assert len(pages) == len(content)
+    for manual_page, document_function in zip(pages, content):
+        assert manual_page.demo is document_function
+        assert manual_page.display_name == inspected_display_name(document_function)
+        assert manual_page.body == inspected_body_text(document_function)
+
+
+class FewCachedPagesApp(main.FormDemoApp):
+    cached_pages = 3
+
+
+def test_demo_controls_of_recent_pages_are_reused_until_evicted(page):
+    app = FewCachedPagesApp(page)
+    app.display_menu_item(1)
+    form = app.result.controls[0]
+    form._fields[("name",)].value = "Edited"
+
+    for index in (2, 3, 1):
+        app.display_menu_item(index)
+
+    assert app.result.controls[0] is form
+    assert form._fields[("name",)].value == "Edited"
+    assert list(app.page_controls) == [2, 3, 1]
+
+    evicted = app.page_controls[2]
+    app.display_menu_item(4)
+
+    assert list(app.page_controls) == [3, 1, 4]
+
+    app.display_menu_item(2)
+
+    assert app.result.controls[0] is not evicted
+    assert list(app.page_controls) == [1, 4, 2]
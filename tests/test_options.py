@@ -0,0 +1,192 @@
+import enum
+import itertools
+import time
+from dataclasses import dataclass
+from dataclasses import field
+from typing import List
+
+from pglet import ChoiceGroup
+from pglet import Dropdown
+
+from form import Form
+from form import SearchableChoice
+from form.options import ProviderOptions
+from form.options import enum_option_source
+from form.options import enum_options
+from form.schema import PROVIDED_CHOICE
+
+Country = enum.Enum("Country", {f"C{index:04}": f"country {index:04}" for index in range(2000)})
+
+
+class Size(enum.Enum):
+    SMALL = "small"
+    LARGE = "large"
+
+
+CUSTOMER_IDS = [f"{index:06}" for index in range(100000)]
+provider_calls = []
+
+
+def find_customers(prefix, offset, limit):
+    provider_calls.append((prefix, offset, limit))
+    matching = (customer_id for customer_id in CUSTOMER_IDS if customer_id.startswith(prefix))
+    return [(customer_id, f"Customer {customer_id}") for customer_id in itertools.islice(matching, offset, offset + limit)]
+
+
+@dataclass
+class Order:
+    customer_id: str = field(default="000042", metadata={"pglet": {"option_provider": find_customers}})
+
+
+@dataclass
+class Address:
+    country: Country = Country.C0001
+    size: Size = Size.SMALL
+
+
+def test_enum_options_are_built_once_per_enum():
+    assert enum_options(Size) is enum_options(Size)
+    assert enum_options(Size) == (("small", "Small"), ("large", "Large"))
+    assert enum_option_source(Country) is enum_option_source(Country)
+
+
+@dataclass
+class Shipping:
+    countries: List[Country] = field(default_factory=lambda: [Country.C0001, Country.C1500])
+
+
+def test_small_enums_keep_their_controls():
+    form = Form(Address)
+
+    assert type(form._fields[("size",)]) is ChoiceGroup
+    assert type(Form(Address, threshold_for_search=2)._fields[("size",)]) is SearchableChoice
+    assert type(Form(Address, threshold_for_dropdown=2)._fields[("size",)]) is Dropdown
+
+
+def test_large_enums_send_only_matching_options(page):
+    form = Form(Address, threshold_for_search=1000)
+    form.page = page
+    control = form._fields[("country",)]
+    control.page = page
+
+    assert type(control) is SearchableChoice
+    assert len(control.dropdown.options) == control.page_size
+    assert control.match_info.value == "1-20 / 2000"
+
+    control.search_box.value = "country 12"
+    control.search_box.on_change(None)
+
+    keys = [option.key for option in control.dropdown.options]
+    # The selected option stays available
+    assert keys[0] == "country 0001"
+    assert keys[1:] == [f"country {index}" for index in range(1200, 1220)]
+    assert control.total == 100
+
+
+def test_searchable_choice_selection_is_validated_and_tracked(page):
+    value = Address()
+    form = Form(value, threshold_for_search=1000)
+    form.page = page
+    control = form._fields[("country",)]
+
+    control.dropdown.value = "country 1999"
+    control.dropdown.on_change(None)
+
+    assert form.dirty_paths == {("country",)}
+    form._submit(None)
+    assert value.country == Country.C1999.value
+
+
+def test_large_enums_with_multiple_choice_send_only_matching_and_selected_options(page):
+    value = Shipping()
+    form = Form(value, threshold_for_search=1000)
+    form.page = page
+    control = form._fields[("countries",)]
+
+    assert type(control) is SearchableChoice
+    assert control.value == ["country 0001", "country 1500"]
+    assert [option.key for option in control.dropdown.options][:2] == ["country 1500", "country 0000"]
+    assert len(control.dropdown.options) == control.page_size + 1
+
+    control.dropdown.value = ["country 0001", "country 1500", "country 0002"]
+    control.dropdown.on_change(None)
+
+    assert form.dirty_paths == {("countries",)}
+    form._submit(None)
+    assert value.countries == ["country 0001", "country 1500", "country 0002"]
+
+    control.dropdown.value = "country 0002"
+    control.dropdown.on_change(None)
+
+    assert control.value == ["country 0002"]
+
+
+def test_option_provider_is_kept_out_of_control_parameters():
+    spec = Form(Order).schema.fields_by_path[("customer_id",)]
+
+    assert spec.kind == PROVIDED_CHOICE
+    assert spec.option_provider is find_customers
+    assert spec.kwargs == {}
+
+
+def test_provided_choices_materialise_only_the_visible_page(page):
+    form = Form(Order)
+    control = form._fields[("customer_id",)]
+    control.page = page
+
+    assert type(control) is SearchableChoice
+    # The selected option and one page
+    assert len(control.dropdown.options) == 21
+    assert control.match_info.value == "1-20+"
+
+    control.search_box.value = "0999"
+    control.search_box.on_change(None)
+    control.next_page_button.on_click(None)
+    control.next_page_button.on_click(None)
+    control.next_page_button.on_click(None)
+    control.next_page_button.on_click(None)
+
+    assert [option.key for option in control.dropdown.options][1:] == [f"0999{index:02}" for index in range(80, 100)]
+    assert control.match_info.value == "81-100 / 100"
+    assert control.next_page_button.disabled
+
+
+def test_provider_queries_are_cached():
+    source = ProviderOptions(find_customers, maxsize=2)
+    provider_calls.clear()
+
+    first = source.search("0012", 0, 20)
+    assert source.search("0012", 0, 20) is first
+    source.search("0013", 0, 20)
+    source.search("0014", 0, 20)
+    source.search("0012", 0, 20)
+
+    assert provider_calls == [("0012", 0, 21), ("0013", 0, 21), ("0014", 0, 21), ("0012", 0, 21)]
+    assert (source.hits, source.misses) == (1, 4)
+    assert source.text_for("001200") == "Customer 001200"
+
+
+def test_provider_queries_expire_after_max_age():
+    source = ProviderOptions(find_customers, max_age=0.05)
+    provider_calls.clear()
+
+    source.search("0012", 0, 20)
+    source.search("0012", 0, 20)
+    time.sleep(0.06)
+    source.search("0012", 0, 20)
+
+    assert provider_calls == [("0012", 0, 21)] * 2
+    assert (source.hits, source.misses) == (1, 2)
+
+
+def test_provided_choice_is_validated_and_submitted(page):
+    value = Order()
+    form = Form(value)
+    form.page = page
+    control = form._fields[("customer_id",)]
+
+    control.dropdown.value = "000007"
+    control.dropdown.on_change(None)
+    form._submit(None)
+
+    assert value.customer_id == "000007"
@@ -0,0 +1,194 @@
+import importlib
+import sys
+import textwrap
+from dataclasses import dataclass
+from dataclasses import field
+from enum import Enum
+from typing import Dict
+from typing import List
+
+import pytest
+from pydantic import BaseModel
+from pydantic import Field
+from pydantic import conint
+
+from form import Form
+from form.precompiled import export_schemas
+from form.precompiled import load_schemas
+from form.schema import FormSchema
+from form.schema import SchemaCache
+
+
+class Color(str, Enum):
+    RED = "red"
+    GREEN = "green"
+    BLUE = "blue"
+
+
+def strip(value, values):
+    return value.strip()
+
+
+@dataclass
+class Address:
+    street: str = ""
+    weight: float = 1.0
+    labels: Dict[str, str] = field(default_factory=dict)
+
+
+class Person(BaseModel):
+    name: str = Field("", title="Full name", description="First and last", pglet={"validators": strip})
+    age: conint(ge=0) = 0
+    color: Color = Color.RED
+    colors: List[Color] = []
+
+
+@dataclass
+class Customer:
+    notes: str = field(default="", metadata={"pglet": {"multiline": True}})
+    address: Address = field(default_factory=Address)
+    addresses: List[Address] = field(default_factory=list)
+
+
+ADDRESSES = """
+    from dataclasses import dataclass
+
+    @dataclass
+    class Address:
+        street: str = ""
+"""
+
+COLORS = """
+    from enum import Enum
+
+    class Color(Enum):
+        RED = "red"
+        GREEN = "green"
+"""
+
+PEOPLE = """
+    from pydantic import BaseModel
+
+    from precompiled_colors import Color
+
+    class Person(BaseModel):
+        name: str = ""
+        color: Color = Color.RED
+"""
+
+OPTIONS = dict(field_validation_default_error_message="Check this value", threshold_for_dropdown=3, max_depth=10)
+
+
+def test_loaded_schemas_match_compiled_ones(tmp_path):
+    path = tmp_path / "schemas.json"
+    export_schemas(path, [Person, Customer])
+    cache = SchemaCache()
+
+    assert load_schemas(path, cache) == 2
+
+    for model in (Person, Customer):
+        loaded = cache.get(model, Form.control_mapping_for(), {}, **OPTIONS)
+        compiled = FormSchema.compile(model, Form.control_mapping_for(), {}, **OPTIONS)
+        assert loaded.fields_by_path == compiled.fields_by_path
+        assert loaded.compile_options == compiled.compile_options
+    assert (cache.hits, cache.misses) == (2, 0)
+
+
+def test_forms_use_loaded_schemas(tmp_path):
+    path = tmp_path / "schemas.json"
+    export_schemas(path, [Customer], toggle_for_bool=True)
+    cache = SchemaCache()
+    Form.schema_cache, original_cache = cache, Form.schema_cache
+    try:
+        load_schemas(path, toggle_for_bool=True)
+        form = Form(Customer, toggle_for_bool=True)
+    finally:
+        Form.schema_cache = original_cache
+
+    assert (cache.hits, cache.misses) == (1, 0)
+    assert form.schema.fields_by_path[("notes",)].kwargs == {"multiline": True}
+    assert form.schema.fields_by_path[("address", "weight")].control_type is Form._float_button
+
+
+def test_export_is_compact_json_without_enum_options(tmp_path):
+    path = tmp_path / "schemas.json"
+    export_schemas(path, [Person])
+
+    text = path.read_text()
+
+    assert "\n" not in text and ", " not in text
+    # Enum fields get their options from the enum class when loaded
+    assert '"Green"' not in text
+
+
+@pytest.fixture
+def source_module(tmp_path, monkeypatch):
+    """Write and import modules of models, to change their source files afterwards."""
+    monkeypatch.syspath_prepend(str(tmp_path))
+    names = []
+
+    def write(name: str, source: str):
+        module_path = tmp_path / f"{name}.py"
+        module_path.write_text(textwrap.dedent(source))
+        if name not in names:
+            names.append(name)
+        # Changed files are not imported again, like in an application that is running
+        return importlib.import_module(name)
+
+    yield write
+    for name in names:
+        sys.modules.pop(name, None)
+
+
+def test_changed_models_are_compiled_instead(tmp_path, source_module):
+    addresses = source_module("precompiled_addresses", ADDRESSES)
+    source_module("precompiled_colors", COLORS)
+    people = source_module("precompiled_people", PEOPLE)
+    path = tmp_path / "schemas.json"
+    export_schemas(path, [addresses.Address, people.Person])
+    source_module("precompiled_addresses", ADDRESSES + "    city: str = ''\n")
+    cache = SchemaCache()
+
+    with pytest.warns(UserWarning, match="Address is out of date"):
+        assert load_schemas(path, cache) == 1
+    assert cache.get(people.Person, Form.control_mapping_for(), {}, **OPTIONS) and cache.hits == 1
+
+
+def test_changed_field_types_are_compiled_instead(tmp_path, source_module):
+    source_module("precompiled_colors", COLORS)
+    people = source_module("precompiled_people", PEOPLE)
+    path = tmp_path / "schemas.json"
+    export_schemas(path, [people.Person])
+    source_module("precompiled_colors", COLORS + "    BLUE = 'blue'\n")
+
+    with pytest.warns(UserWarning, match="Person is out of date"):
+        assert load_schemas(path, SchemaCache()) == 0
+
+
+def test_schemas_for_other_options_are_ignored(tmp_path):
+    path = tmp_path / "schemas.json"
+    export_schemas(path, [Person], threshold_for_dropdown=5)
+
+    with pytest.warns(UserWarning, match="other form options"):
+        assert load_schemas(path, SchemaCache()) == 0
+    with pytest.warns(UserWarning, match="other form options"):
+        assert load_schemas(path, SchemaCache(), threshold_for_dropdown=5, toggle_for_bool=True) == 0
+    assert load_schemas(path, SchemaCache(), threshold_for_dropdown=5) == 1
+
+
+def test_models_that_cannot_be_imported_are_not_exported(tmp_path):
+    @dataclass
+    class Local:
+        name: str = ""
+
+    with pytest.raises(ValueError, match="cannot be imported"):
+        export_schemas(tmp_path / "schemas.json", [Local])
+
+
+def test_msgpack_files(tmp_path):
+    pytest.importorskip("msgpack")
+    path = tmp_path / "schemas.msgpack"
+    export_schemas(path, [Person])
+
+    assert load_schemas(path, SchemaCache()) == 1
+
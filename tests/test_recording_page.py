@@ -0,0 +1,151 @@
+import dataclasses
+import json
+from typing import List
+
+from pglet import Stack
+from pglet import Text
+from pydantic import BaseModel
+from pydantic import conint
+
+from form import Form
+from form.testing import RecordingPage
+
+
+FiftyFields = dataclasses.make_dataclass(
+    "FiftyFields", [(f"field_{index}", str, dataclasses.field(default="")) for index in range(50)]
+)
+
+
+@dataclasses.dataclass
+class Tags:
+    tags: List[str] = dataclasses.field(default_factory=lambda: ["a", "b", "c"])
+
+
+class Order(BaseModel):
+    customer: str = ""
+    quantity: conint(ge=1) = 1
+
+
+def dashboard_with_form(page, form):
+    """Page with a dashboard of other controls next to the form, like the pages that host forms."""
+    dashboard = Stack(controls=[Text(value=str(index)) for index in range(100)])
+    page.add(Stack(controls=[dashboard, form]))
+    return dashboard
+
+
+def find(snapshot, control_type):
+    found = [snapshot] if snapshot["type"] == control_type else []
+    for child in snapshot["controls"]:
+        found.extend(find(child, control_type))
+    return found
+
+
+def test_submit_of_a_50_field_form_emits_at_most_one_update():
+    page = RecordingPage()
+    form = Form(FiftyFields)
+    page.add(form)
+
+    with page.recording() as recording:
+        form._fields[("field_1",)].value = "changed"
+        form._submit(None)
+
+    assert recording.updates <= 1
+    assert recording.batches <= 1
+    assert recording.controls_added == 0
+    assert 0 < recording.bytes < 1000
+
+
+def test_adding_a_form_is_recorded_and_snapshotted():
+    page = RecordingPage()
+    form = Form(FiftyFields)
+
+    with page.recording() as recording:
+        page.add(form)
+
+    textboxes = find(page.snapshot(), "textbox")
+    assert len(textboxes) == 50
+    assert recording.controls_added == page.connection.total.controls_added
+    assert recording.bytes > 50 * len('"textbox"')
+    assert json.loads(page.snapshot_json()) == page.snapshot()
+
+
+def test_snapshot_follows_changes_and_removals():
+    page = RecordingPage()
+    form = Form(Tags())
+    page.add(form)
+    control = form._fields[("tags",)]
+
+    with page.recording() as recording:
+        control.list_delete(0, None)
+
+    assert recording.controls_removed == 1
+    assert recording.controls_added == 0
+    assert [textbox["attrs"]["value"] for textbox in find(page.snapshot(), "textbox")] == ["b", "c"]
+
+
+def test_recordings_outside_the_block_are_not_affected():
+    page = RecordingPage()
+    form = Form(Tags())
+    page.add(form)
+
+    with page.recording() as recording:
+        pass
+    form.update()
+
+    assert recording.updates == 0
+    assert page.updates == 1
+
+
+def test_field_validation_updates_only_the_field(page):
+    form = Form(Order, metrics=True)
+    dashboard = dashboard_with_form(page, form)
+    # Changed but not updated by the dashboard, so not sent with the updates of the form
+    dashboard.controls[0].value = "changed"
+
+    form._fields[("quantity",)].value = 0
+    with page.recording() as recording:
+        form._live_validate(("quantity",))
+
+    assert recording.updates == 1
+    assert form._messages[("quantity",)].visible
+    assert find(page.snapshot(), "text")[0]["attrs"]["value"] == "0"
+    assert form.metrics.counters["full_page_updates"] == 0
+
+
+def test_submit_updates_only_the_form(page):
+    form = Form(Order)
+    dashboard = dashboard_with_form(page, form)
+    dashboard.controls[0].value = "changed"
+
+    with page.recording() as recording:
+        form._fields[("quantity",)].value = 0
+        form._submit(None)
+
+    assert recording.updates == 1
+    assert find(page.snapshot(), "text")[0]["attrs"]["value"] == "0"
+    assert form.submit_button.icon == "Cancel"
+
+
+def test_controls_not_on_the_page_fall_back_to_a_full_update(page):
+    dashboard = dashboard_with_form(page, Stack())
+    dashboard.controls[0].value = "changed"
+    form = Form(Order, metrics=True)
+    form.page = page
+
+    form._fields[("quantity",)].value = 0
+    form._live_validate(("quantity",))
+
+    assert find(page.snapshot(), "text")[0]["attrs"]["value"] == "changed"
+    assert form.metrics.counters["full_page_updates"] == 1
+
+
+def test_list_changes_update_only_the_list(page):
+    form = Form(Tags())
+    dashboard = dashboard_with_form(page, form)
+    dashboard.controls[0].value = "changed"
+
+    with page.recording() as recording:
+        form._fields[("tags",)].list_delete(0, None)
+
+    assert recording.controls_removed == 1
+    assert find(page.snapshot(), "text")[0]["attrs"]["value"] == "0"
@@ -0,0 +1,105 @@
+import gc
+import tracemalloc
+
+import pytest
+from pydantic import BaseModel
+from pydantic import Field
+from pydantic import create_model
+
+from form import Form
+from form.registry import FieldRegistry
+
+
+class Nested(BaseModel):
+    title: str = ""
+
+
+class Model(BaseModel):
+    name: str = ""
+    nested: Nested = Nested()
+    age: int = 0
+
+
+def test_states_are_stored_in_schema_slots():
+    form = Form(Model())
+    registry = form._registry
+
+    assert len(registry) == 4
+    assert [state.path for state in registry] == list(form.schema.fields_by_path)
+    assert registry[("nested", "title")].control is form._fields[("nested", "title")]
+    assert registry[("nested", "title")].path is form.schema.fields_by_path[("nested", "title")].path
+    assert registry[("age",)].field.pydantic_field is Model.__fields__["age"]
+    assert ("missing",) not in registry
+    assert registry.get(("missing",)) is None
+    with pytest.raises(KeyError):
+        registry[("missing",)]
+
+
+def test_messages_view_skips_fields_without_messages():
+    form = Form(Model())
+
+    assert form._registry[("nested",)].message is None
+    assert ("nested",) not in form._messages
+    assert set(form._messages) == {("name",), ("nested", "title"), ("age",)}
+    assert len(form._messages) == 3
+
+
+def test_unbuilt_sections_leave_their_slots_empty(page):
+    form = Form(Model(), collapse_sections=True)
+    form.page = page
+
+    assert len(form._registry) == 3
+    assert ("nested", "title") not in form._registry
+
+    form._fields[("nested",)].toggle(None)
+
+    assert len(form._registry) == 4
+    assert form._registry[("nested", "title")].valid is None
+
+
+def test_validation_state_is_kept_per_field(page):
+    form = Form(Model())
+    form.page = page
+    form._submit(None)
+
+    state = form._registry[("name",)]
+    assert state.valid and not state.dirty
+
+    form._mark_dirty(("name",))
+
+    assert state.dirty
+    assert form.dirty_paths == {("name",)}
+
+
+def traced_bytes(build):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        gc.collect()
+        return tracemalloc.get_traced_memory()[0] - before, result
+    finally:
+        tracemalloc.stop()
+
+
+def test_registry_takes_less_memory_than_dicts_per_field():
+    model = create_model("Wide", **{f"field_{index}": (str, Field("")) for index in range(200)})
+    form = Form(model())
+    states = list(form._registry)
+
+    def dicts():
+        # What the form used to keep: controls, messages, pydantic fields and validation results by path
+        names = ("control", "message", "field", "valid")
+        return [{state.path: getattr(state, name) for state in states} for name in names]
+
+    def registry():
+        registry = FieldRegistry(form.schema)
+        for state in states:
+            registry.add(state.field, state.control, state.message)
+        return registry
+
+    dict_bytes, _ = traced_bytes(dicts)
+    registry_bytes, _ = traced_bytes(registry)
+
+    assert registry_bytes < dict_bytes